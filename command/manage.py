@@ -7,7 +7,9 @@ import psutil
 
 from model.file import FileModel, DirModel
 from model import public_types as ptype
+from settings import settings
 from utils.logger import sysLogger
+from utils.public_func import generate_ftp_port
 from .services import HttpService, FtpService
 
 
@@ -143,7 +145,8 @@ class ServiceProcessManager:
             self._http_service.start()
 
         sysLogger.debug("[HTTP] 开始添加分享")
-        self._http_input_q.put(("add", fileObj))
+        # 只发送分享的路径、uuid和FTP参数, 由服务进程自行扫描文件树, 发送耗时与分享大小无关
+        self._http_input_q.put(("add", fileObj.to_dump_backup()))
         return True
 
     def _add_ftp_share(self, fileObj: Union[FileModel, DirModel]) -> bool:
@@ -153,14 +156,17 @@ class ServiceProcessManager:
             self._ftp_input_q = Queue()
             sysLogger.debug("[FTP] 初始化输入队列成功")
         if self._ftp_service is None:
-            sysLogger.debug("[FTP] 开始初始化服务")
+            # 所有FTP分享共用一个端口, 开启服务前选定, 并同步给HTTP服务用于生成FTP下载数据
+            settings.FTP_PORT = generate_ftp_port(settings.FTP_PORT)
+            self.modify_settings("FTP_PORT", settings.FTP_PORT)
+            sysLogger.debug(f"[FTP] 开始初始化服务, 端口: {settings.FTP_PORT}")
             ftp_service = FtpService(self._ftp_input_q, self._output_q)
             self._ftp_service = Process(target=ftp_service.run)
             self._ftp_service.daemon = True
             self._ftp_service.start()
 
         sysLogger.debug("[FTP] 开始追加分享")
-        self._ftp_input_q.put(("add", fileObj))
+        self._ftp_input_q.put(("add", fileObj.to_dump_backup()))
         return True
 
     def _remove_http_share(self, uuid: str) -> bool:
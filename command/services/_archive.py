@@ -0,0 +1,194 @@
+__all__ = ["ArchiveResponse", "collect_archive_entries"]
+
+import os
+import stat
+import time
+import tarfile
+import zipfile
+from typing import AsyncGenerator, Iterator, List, Mapping, Tuple, Union
+
+import aiofiles
+from fastapi.responses import StreamingResponse
+
+from model import public_types as ptype
+
+# (文件/文件夹路径, 在压缩包中的路径, stat结果)
+_ArchiveEntry = Tuple[str, str, os.stat_result]
+
+
+def _walk_archive_entries(path: str, arcname: str) -> Iterator[_ArchiveEntry]:
+    """
+    递归遍历文件夹, 依次生成需写入压缩包的文件夹与文件, 不跟随符号链接的文件夹, 跳过无权限读取的文件
+
+    Args:
+        path: 文件夹路径
+        arcname: 文件夹在压缩包中的路径
+
+    Returns:
+        Iterator[_ArchiveEntry]: 需写入压缩包的文件夹与文件
+    """
+    yield path, arcname, os.stat(path)
+    try:
+        entries = sorted(os.scandir(path), key=lambda x: x.name)
+    except OSError:
+        return
+    for entry in entries:
+        entry_arcname = f"{arcname}/{entry.name}"
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk_archive_entries(entry.path, entry_arcname)
+            elif entry.is_file() and os.access(entry.path, os.R_OK):
+                yield entry.path, entry_arcname, entry.stat()
+        except OSError:
+            continue
+
+
+def collect_archive_entries(path: str) -> List[_ArchiveEntry]:
+    """
+    遍历文件夹并取得需写入压缩包的所有文件夹与文件, 遍历会逐个stat, 耗时与文件个数成正比,
+    需在线程中调用, 不可阻塞事件循环
+
+    Args:
+        path: 文件夹路径
+
+    Returns:
+        List[_ArchiveEntry]: 需写入压缩包的文件夹与文件
+    """
+    return list(_walk_archive_entries(path, os.path.basename(path.rstrip(os.sep))))
+
+
+class _ChunkWriter:
+    def __init__(self):
+        """
+        压缩包数据收集类初始化函数, 作为不可seek的文件对象交给zipfile写入, 写入的数据随后被取走发送
+        """
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def pop(self) -> bytes:
+        """
+        取走已写入的数据
+
+        Returns:
+            bytes: 已写入的数据
+        """
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ArchiveResponse(StreamingResponse):
+    chunk_size = 1048576
+
+    def __init__(
+        self,
+        entries: List[_ArchiveEntry],
+        archive_type: ptype.ArchiveType,
+        headers: Union[None, Mapping[str, str]] = None,
+    ):
+        """
+        文件夹打包下载响应类初始化函数, 边读取文件边以不压缩的TAR/ZIP(存储模式)格式发送,
+        不生成临时文件, 文件数据不驻留内存
+
+        Args:
+            entries: 需写入压缩包的文件夹与文件, 由collect_archive_entries在线程中取得
+            archive_type: 压缩包格式
+            headers: 响应头, 默认为None
+        """
+        self._entries = entries
+        headers = dict(headers or {})
+        if archive_type is ptype.ArchiveType.tar:
+            # TAR的大小在打包前即可确定, 便于客户端显示下载进度
+            headers["content-length"] = str(self._calc_tar_size())
+            content, media_type = self._tar_generator(), "application/x-tar"
+        else:
+            content, media_type = self._zip_generator(), "application/zip"
+        super(ArchiveResponse, self).__init__(content, 200, headers, media_type)
+
+    @staticmethod
+    def _generate_tarinfo(arcname: str, stat_result: os.stat_result) -> tarfile.TarInfo:
+        tarinfo = tarfile.TarInfo(arcname)
+        tarinfo.mtime = int(stat_result.st_mtime)
+        tarinfo.mode = stat.S_IMODE(stat_result.st_mode)
+        if stat.S_ISDIR(stat_result.st_mode):
+            tarinfo.type = tarfile.DIRTYPE
+        else:
+            tarinfo.size = stat_result.st_size
+
+        return tarinfo
+
+    @staticmethod
+    def _generate_zipinfo(arcname: str, stat_result: os.stat_result) -> zipfile.ZipInfo:
+        # 与ZipInfo.from_file一致, 但直接使用遍历时的stat结果, 不在事件循环中再次stat
+        is_dir = stat.S_ISDIR(stat_result.st_mode)
+        date_time = time.localtime(stat_result.st_mtime)[0:6]
+        zinfo = zipfile.ZipInfo(f"{arcname}/" if is_dir else arcname, date_time)
+        zinfo.external_attr = (stat_result.st_mode & 0xFFFF) << 16
+        if is_dir:
+            zinfo.file_size = 0
+            zinfo.external_attr |= 0x10
+        else:
+            zinfo.file_size = stat_result.st_size
+
+        return zinfo
+
+    @staticmethod
+    def _tar_header(tarinfo: tarfile.TarInfo) -> bytes:
+        return tarinfo.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+
+    def _calc_tar_size(self) -> int:
+        size = 0
+        for _, arcname, stat_result in self._entries:
+            tarinfo = self._generate_tarinfo(arcname, stat_result)
+            size += len(self._tar_header(tarinfo))
+            size += -(-tarinfo.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+
+        return size + tarfile.BLOCKSIZE * 2
+
+    async def _tar_generator(self) -> AsyncGenerator:
+        for path, arcname, stat_result in self._entries:
+            tarinfo = self._generate_tarinfo(arcname, stat_result)
+            yield self._tar_header(tarinfo)
+            if tarinfo.isdir():
+                continue
+            remaining = tarinfo.size
+            async with aiofiles.open(path, "rb") as f:
+                while remaining > 0:
+                    chunk = await f.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+            # 文件在打包过程中变小时以0补齐, 保证与已发送的文件头一致
+            padding = remaining + (-tarinfo.size) % tarfile.BLOCKSIZE
+            if padding:
+                yield bytes(padding)
+
+        yield bytes(tarfile.BLOCKSIZE * 2)
+
+    async def _zip_generator(self) -> AsyncGenerator:
+        # 写入不可seek的文件对象时, zipfile会在每个文件数据后追加数据描述符记录CRC和大小
+        writer = _ChunkWriter()
+        with zipfile.ZipFile(writer, "w", zipfile.ZIP_STORED) as zf:
+            for path, arcname, stat_result in self._entries:
+                zinfo = self._generate_zipinfo(arcname, stat_result)
+                if zinfo.is_dir():
+                    zf.writestr(zinfo, b"")
+                    yield writer.pop()
+                    continue
+                async with aiofiles.open(path, "rb") as f:
+                    with zf.open(zinfo, "w") as dest:
+                        while True:
+                            chunk = await f.read(self.chunk_size)
+                            if not chunk:
+                                break
+                            dest.write(chunk)
+                            yield writer.pop()
+                yield writer.pop()
+        yield writer.pop()
@@ -43,8 +43,8 @@ class BaseService:
         while True:
             command_type, command_msg = self._input_q.get()
             if command_type == "add":
-                self._sysLogger_debug(f"接到添加分享任务, 分享路径: {command_msg.targetPath}")
-                self._add_share(command_msg)
+                self._sysLogger_debug(f"接到添加分享任务, 分享路径: {command_msg['path']}")
+                self._add_share(FileModel.load_dump_backup(command_msg))
             elif command_type == "remove":
                 self._sysLogger_debug(f"接到移除分享任务, 分享的uuid: {command_msg}")
                 self._remove_share(command_msg)
@@ -0,0 +1,270 @@
+__all__ = ["PollingFsWatcher", "InotifyFsWatcher", "create_fs_watcher"]
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from threading import Thread, Lock
+from traceback import format_exc
+from typing import Callable, Dict, Set
+
+from settings import settings
+from utils import public_func
+from utils.logger import sysLogger
+
+
+class PollingFsWatcher:
+    def __init__(self, callback: Callable[[str], None], interval: float):
+        """
+        轮询方式的文件夹变化监听类初始化函数, 定时比对文件夹的修改时间及其下各文件的大小和修改时间,
+        文件夹内新增、删除、重命名文件/文件夹时其修改时间都会变化,
+        文件被就地改写时文件夹的修改时间不变, 需由文件的大小和修改时间发现
+
+        Args:
+            callback: 文件夹发生变化时的回调, 参数为发生变化的文件夹路径
+            interval: 轮询间隔(秒)
+        """
+        self._callback = callback
+        self._interval = interval
+        self._lock = Lock()
+        self._callback_lock = Lock()
+        # 同一文件夹可能被多个分享包含, 需计数, 全部移除后才停止监听
+        self._path_refs: Dict[str, int] = {}
+        self._poll_paths: Dict[str, int] = {}
+
+    def start(self) -> None:
+        """
+        开启监听线程
+
+        Returns:
+            None
+        """
+        t = Thread(target=self._poll_loop)
+        t.setDaemon(True)
+        t.start()
+
+    def add(self, path: str) -> None:
+        """
+        监听文件夹
+
+        Args:
+            path: 文件夹路径
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._path_refs[path] = self._path_refs.get(path, 0) + 1
+            if self._path_refs[path] > 1:
+                return
+        self._add_watch(path)
+
+    def remove(self, path: str) -> None:
+        """
+        停止监听文件夹
+
+        Args:
+            path: 文件夹路径
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if path not in self._path_refs:
+                return
+            self._path_refs[path] -= 1
+            if self._path_refs[path] > 0:
+                return
+            del self._path_refs[path]
+        self._remove_watch(path)
+
+    def _add_watch(self, path: str) -> None:
+        signature = self._stat_signature(path)
+        with self._lock:
+            self._poll_paths[path] = signature
+
+    def _remove_watch(self, path: str) -> None:
+        with self._lock:
+            self._poll_paths.pop(path, None)
+
+    def _notify(self, path: str) -> None:
+        # 回调会修改文件夹对象, 需逐个执行
+        with self._callback_lock:
+            try:
+                self._callback(path)
+            except Exception:
+                sysLogger.error(f"处理文件夹变化失败, 文件夹路径: {path}, 错误原始明细如下:\n{format_exc()}")
+
+    def _poll_loop(self) -> None:
+        while True:
+            time.sleep(self._interval)
+            with self._lock:
+                poll_items = list(self._poll_paths.items())
+            for path, signature in poll_items:
+                new_signature = self._stat_signature(path)
+                if new_signature == signature:
+                    continue
+                with self._lock:
+                    if path not in self._poll_paths:
+                        continue
+                    self._poll_paths[path] = new_signature
+                self._notify(path)
+
+    @staticmethod
+    def _stat_signature(path: str) -> int:
+        # 文件夹的修改时间加上各文件的大小和修改时间, 只保存其哈希值, 不随文件个数占用内存,
+        # Windows下DirEntry自带大小和修改时间, 每个文件夹每次轮询仅需一次scandir
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            entries = public_func.scan_dir(path)
+        except OSError:
+            return -1
+        files = []
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    continue
+                stat_result = entry.stat()
+            except OSError:
+                continue
+            files.append((entry.name, stat_result.st_size, stat_result.st_mtime_ns))
+        files.sort()
+
+        return hash((mtime_ns, tuple(files)))
+
+
+class InotifyFsWatcher(PollingFsWatcher):
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    _event_struct = struct.Struct("iIII")
+    # 批量复制/删除文件时, 合并该时间(秒)内的事件后再处理
+    _merge_delay = 0.2
+
+    def __init__(self, callback: Callable[[str], None], interval: float):
+        """
+        inotify方式的文件夹变化监听类初始化函数, 由内核通知文件夹的变化,
+        无法添加inotify监听(如超出监听数量上限)的文件夹退回到轮询
+
+        Args:
+            callback: 文件夹发生变化时的回调, 参数为发生变化的文件夹路径
+            interval: 轮询间隔(秒)
+        """
+        super(InotifyFsWatcher, self).__init__(callback, interval)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._wd_paths: Dict[int, str] = {}
+        self._path_wds: Dict[str, int] = {}
+
+    def start(self) -> None:
+        """
+        开启监听线程
+
+        Returns:
+            None
+        """
+        super(InotifyFsWatcher, self).start()
+        t = Thread(target=self._read_loop)
+        t.setDaemon(True)
+        t.start()
+
+    def _add_watch(self, path: str) -> None:
+        # 文件被改写或修改时间变化时文件夹的修改时间不变, 也需通知, 列表中的文件大小和修改时间才能及时更新
+        mask = (
+            self.IN_ATTRIB
+            | self.IN_CLOSE_WRITE
+            | self.IN_CREATE
+            | self.IN_DELETE
+            | self.IN_MOVED_FROM
+            | self.IN_MOVED_TO
+            | self.IN_ONLYDIR
+        )
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            sysLogger.debug(
+                f"添加inotify监听失败, 退回到轮询, 文件夹路径: {path}, 错误信息: {os.strerror(ctypes.get_errno())}"
+            )
+            super(InotifyFsWatcher, self)._add_watch(path)
+            return
+        with self._lock:
+            self._wd_paths[wd] = path
+            self._path_wds[path] = wd
+
+    def _remove_watch(self, path: str) -> None:
+        with self._lock:
+            wd = self._path_wds.pop(path, None)
+            if wd is not None:
+                self._wd_paths.pop(wd, None)
+        if wd is not None:
+            self._libc.inotify_rm_watch(self._fd, wd)
+        super(InotifyFsWatcher, self)._remove_watch(path)
+
+    def _read_loop(self) -> None:
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                sysLogger.error(f"读取inotify事件失败, 停止监听, 错误信息: {e}")
+                return
+
+            changed_paths = set()
+            self._parse_events(data, changed_paths)
+            deadline = time.monotonic() + self._merge_delay
+            while True:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0 or not select.select([self._fd], [], [], timeout)[0]:
+                    break
+                self._parse_events(os.read(self._fd, 65536), changed_paths)
+
+            for path in changed_paths:
+                self._notify(path)
+
+    def _parse_events(self, data: bytes, changed_paths: Set[str]) -> None:
+        offset = 0
+        while offset + self._event_struct.size <= len(data):
+            wd, mask, _, length = self._event_struct.unpack_from(data, offset)
+            offset += self._event_struct.size + length
+            with self._lock:
+                # 事件队列溢出时, 无法得知哪些文件夹变化了, 全部重新扫描
+                if mask & self.IN_Q_OVERFLOW:
+                    changed_paths.update(self._path_wds)
+                elif mask & self.IN_IGNORED:
+                    path = self._wd_paths.pop(wd, None)
+                    if path is not None and self._path_wds.get(path) == wd:
+                        del self._path_wds[path]
+                elif wd in self._wd_paths:
+                    changed_paths.add(self._wd_paths[wd])
+
+
+def create_fs_watcher(callback: Callable[[str], None]) -> PollingFsWatcher:
+    """
+    创建文件夹变化监听对象, Linux下使用inotify, 其他系统或inotify不可用时使用轮询
+
+    Args:
+        callback: 文件夹发生变化时的回调, 参数为发生变化的文件夹路径
+
+    Returns:
+        PollingFsWatcher: 文件夹变化监听对象
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyFsWatcher(callback, settings.FS_POLL_INTERVAL)
+        except (OSError, AttributeError) as e:
+            sysLogger.warning(f"inotify不可用, 退回到轮询监听文件夹变化, 错误信息: {e}")
+
+    return PollingFsWatcher(callback, settings.FS_POLL_INTERVAL)
@@ -0,0 +1,432 @@
+__all__ = [
+    "ZEROCOPY_SEND",
+    "parse_range_header",
+    "generate_etag",
+    "is_not_modified",
+    "is_range_fresh",
+    "SendfileMiddleware",
+    "SendfileResponse",
+    "MultipartSendfileResponse",
+]
+
+import os
+import re
+import asyncio
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncGenerator, List, Mapping, Sequence, Tuple, Union
+
+import aiofiles
+import h11
+from fastapi.responses import StreamingResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from settings import settings
+from utils import public_func
+from utils.logger import sysLogger
+
+# ASGI零拷贝扩展名称, 参见ASGI规范的`Zero Copy Send`扩展
+ZEROCOPY_SEND: str = "http.response.zerocopysend"
+
+_RANGE_SPEC_RE = re.compile(r"^(\d*)-(\d*)$")
+
+
+def parse_range_header(
+    range_str: str, file_size: int
+) -> Union[None, List[Tuple[int, int]]]:
+    """
+    按RFC 7233解析Range请求头
+
+    Args:
+        range_str: Range请求头的值
+        file_size: 文件大小
+
+    Returns:
+        Union[None, List[Tuple[int, int]]]: 请求头缺失或不合法时为None(应返回完整文件),
+            否则为排序合并后的可满足区间列表, 每个区间为(起始偏移, 结束偏移(含)),
+            列表为空表示所有区间均不可满足(应返回416)
+    """
+    unit, _, range_set = range_str.partition("=")
+    if unit.strip().lower() != "bytes" or not range_set.strip():
+        return None
+
+    ranges: List[Tuple[int, int]] = []
+    for range_spec in range_set.split(","):
+        range_match = _RANGE_SPEC_RE.match(range_spec.strip())
+        if range_match is None:
+            return None
+        first, last = range_match.groups()
+        if first:
+            start = int(first)
+            end = int(last) if last else file_size - 1
+            if last and end < start:
+                return None
+            if start >= file_size:
+                continue
+        elif last:
+            # 后缀区间, 即文件的最后N个字节
+            suffix_length = int(last)
+            if suffix_length == 0:
+                continue
+            start = max(file_size - suffix_length, 0)
+            end = file_size - 1
+        else:
+            return None
+        ranges.append((start, min(end, file_size - 1)))
+
+    # 合并重叠或相邻的区间, 避免重复发送相同的数据
+    ranges.sort()
+    merged: List[Tuple[int, int]] = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+def generate_etag(stat_result: os.stat_result) -> str:
+    """
+    由inode、文件大小和修改时间生成强校验的ETag, 文件被修改或替换后ETag即变化
+
+    Args:
+        stat_result: 文件的stat结果
+
+    Returns:
+        str: ETag
+    """
+    return '"%x-%x-%x"' % (
+        stat_result.st_ino,
+        stat_result.st_size,
+        stat_result.st_mtime_ns,
+    )
+
+
+def _parse_http_date(date_str: str) -> Union[None, int]:
+    try:
+        return int(parsedate_to_datetime(date_str).timestamp())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def is_not_modified(
+    if_none_match: str, if_modified_since: str, etag: str, st_mtime: float
+) -> bool:
+    """
+    按RFC 7232校验If-None-Match/If-Modified-Since, 判断是否可以返回304
+
+    Args:
+        if_none_match: If-None-Match请求头的值
+        if_modified_since: If-Modified-Since请求头的值
+        etag: 文件当前的ETag
+        st_mtime: 文件当前的修改时间
+
+    Returns:
+        bool: 文件是否未被修改
+    """
+    # 存在If-None-Match时忽略If-Modified-Since, If-None-Match使用弱比较
+    if if_none_match:
+        if if_none_match.strip() == "*":
+            return True
+        candidates = [x.strip() for x in if_none_match.split(",")]
+        return any(x.lstrip("W/") == etag for x in candidates)
+    if if_modified_since:
+        since = _parse_http_date(if_modified_since)
+        return since is not None and int(st_mtime) <= since
+
+    return False
+
+
+def is_range_fresh(if_range: str, etag: str, st_mtime: float) -> bool:
+    """
+    按RFC 7233校验If-Range, 判断客户端持有的文件版本是否与当前一致, 一致时才按区间返回
+
+    Args:
+        if_range: If-Range请求头的值
+        etag: 文件当前的ETag
+        st_mtime: 文件当前的修改时间
+
+    Returns:
+        bool: 是否按区间返回
+    """
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    # If-Range必须使用强比较, 弱ETag永远不匹配
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    since = _parse_http_date(if_range)
+    return since is not None and int(st_mtime) == since
+
+
+class _FileSegment:
+    def __init__(self, count: int):
+        """
+        文件片段占位对象初始化函数, 仅用于让h11计算报文长度, 实际数据由sendfile写出
+
+        Args:
+            count: 文件片段的字节数
+        """
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class SendfileMiddleware:
+    # 零拷贝发送依赖的uvicorn(h11实现)请求周期对象的内部属性, 版本已在requirements.txt中固定
+    _cycle_attrs = (
+        "conn",
+        "transport",
+        "flow",
+        "scope",
+        "disconnected",
+        "response_started",
+        "response_complete",
+    )
+
+    def __init__(self, app: ASGIApp):
+        """
+        零拷贝发送中间件类初始化函数, 需作为最外层ASGI应用交给uvicorn运行,
+        为uvicorn的h11连接提供`http.response.zerocopysend`扩展,
+        依赖的uvicorn内部实现不可用时不提供该扩展, 下载退回到aiofiles分块读取发送
+
+        Args:
+            app: 被包装的ASGI应用
+        """
+        self._app = app
+        self._cycle_class = self._load_cycle_class()
+        self._cycle_checked = False
+
+    @staticmethod
+    def _load_cycle_class() -> Union[None, type]:
+        """
+        启动时自检uvicorn的h11请求周期类及h11的数据透传接口是否可用
+
+        Returns:
+            Union[None, type]: uvicorn的h11请求周期类, 不可用时为None
+        """
+        try:
+            from uvicorn.protocols.http.h11_impl import RequestResponseCycle
+        except ImportError as e:
+            sysLogger.warning(f"uvicorn的h11实现不可用, 下载退回到分块读取发送, 错误信息: {e}")
+            return None
+        if not hasattr(h11.Connection, "send_with_data_passthrough") or not hasattr(
+            RequestResponseCycle, "send"
+        ):
+            sysLogger.warning("uvicorn/h11版本不兼容零拷贝发送, 下载退回到分块读取发送")
+            return None
+
+        return RequestResponseCycle
+
+    def _get_cycle(self, send: Send) -> Any:
+        """
+        由send取得uvicorn的请求周期对象, 并校验零拷贝发送所需的内部属性, 所有内部属性的探测都只在此处进行
+
+        Args:
+            send: uvicorn传入的send函数
+
+        Returns:
+            Any: uvicorn的请求周期对象, 不支持零拷贝发送时为None
+        """
+        if self._cycle_class is None:
+            return None
+        cycle = getattr(send, "__self__", None)
+        if not isinstance(cycle, self._cycle_class):
+            return None
+        if not self._cycle_checked:
+            missing = [x for x in self._cycle_attrs if not hasattr(cycle, x)]
+            if missing:
+                sysLogger.warning(f"uvicorn的请求周期对象缺少属性{missing}, 下载退回到分块读取发送")
+                self._cycle_class = None
+                return None
+            self._cycle_checked = True
+
+        return cycle
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        cycle = self._get_cycle(send) if scope["type"] == "http" else None
+        if cycle is None:
+            await self._app(scope, receive, send)
+            return
+
+        async def zerocopy_send(message: Message) -> None:
+            if message["type"] == ZEROCOPY_SEND:
+                await self._zerocopy_send(cycle, message)
+            else:
+                await send(message)
+
+        scope.setdefault("extensions", {})[ZEROCOPY_SEND] = {}
+        await self._app(scope, receive, zerocopy_send)
+
+    @staticmethod
+    async def _zerocopy_send(cycle: Any, message: Message) -> None:
+        if cycle.flow.write_paused and not cycle.disconnected:
+            await cycle.flow.drain()
+        if cycle.disconnected:
+            return
+        if not cycle.response_started or cycle.response_complete:
+            raise RuntimeError(f"Unexpected ASGI message '{ZEROCOPY_SEND}' sent.")
+
+        file = message["file"]
+        offset = message.get("offset") or 0
+        count = message.get("count")
+        if count is None:
+            count = os.fstat(file.fileno()).st_size - offset
+        if count > 0 and cycle.scope["method"] != "HEAD":
+            loop = asyncio.get_running_loop()
+            segment = _FileSegment(count)
+            # 由h11生成报文分隔(如chunked编码的块头), 文件内容本身交给内核直接写入套接字
+            for data in cycle.conn.send_with_data_passthrough(h11.Data(data=segment)):
+                if data is segment:
+                    try:
+                        await loop.sendfile(cycle.transport, file, offset, count)
+                    except (ConnectionError, RuntimeError):
+                        cycle.disconnected = True
+                        return
+                else:
+                    cycle.transport.write(data)
+
+        if not message.get("more_body", False):
+            await cycle.send(
+                {"type": "http.response.body", "body": b"", "more_body": False}
+            )
+
+
+class SendfileResponse(StreamingResponse):
+    chunk_size = 1048576
+
+    def __init__(
+        self,
+        path: str,
+        offset: int,
+        count: int,
+        status_code: int = 200,
+        headers: Union[None, Mapping[str, str]] = None,
+        media_type: str = "application/octet-stream",
+    ):
+        """
+        文件下载响应类初始化函数, 服务器支持时以零拷贝(sendfile)方式发送文件内容,
+        否则退回到aiofiles分块读取发送
+
+        Args:
+            path: 文件路径
+            offset: 发送起始偏移
+            count: 发送的字节数
+            status_code: 响应状态码, 默认为200
+            headers: 响应头, 默认为None
+            media_type: 响应的媒体类型, 默认为application/octet-stream
+        """
+        self._path = path
+        # 每个片段为(前置的报文数据, 文件偏移, 字节数), 最后再发送结尾的报文数据
+        self._parts: List[Tuple[bytes, int, int]] = [(b"", offset, count)]
+        self._trailer = b""
+        super(SendfileResponse, self).__init__(
+            self._file_generator(), status_code, headers, media_type
+        )
+
+    async def _file_generator(self) -> AsyncGenerator:
+        async with aiofiles.open(self._path, "rb") as f:
+            for prefix, offset, count in self._parts:
+                if prefix:
+                    yield prefix
+                await f.seek(offset, os.SEEK_SET)
+                remaining = count
+                while remaining > 0:
+                    chunk = await f.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+        if self._trailer:
+            yield self._trailer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self._zerocopy = settings.ZERO_COPY_DOWNLOAD and ZEROCOPY_SEND in scope.get(
+            "extensions", {}
+        )
+        await super(SendfileResponse, self).__call__(scope, receive, send)
+
+    async def stream_response(self, send: Send) -> None:
+        if not self._zerocopy:
+            await super(SendfileResponse, self).stream_response(send)
+            return
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        with open(self._path, "rb") as f:
+            for prefix, offset, count in self._parts:
+                if prefix:
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": prefix,
+                            "more_body": True,
+                        }
+                    )
+                await send(
+                    {
+                        "type": ZEROCOPY_SEND,
+                        "file": f,
+                        "offset": offset,
+                        "count": count,
+                        "more_body": True,
+                    }
+                )
+        await send(
+            {"type": "http.response.body", "body": self._trailer, "more_body": False}
+        )
+
+
+class MultipartSendfileResponse(SendfileResponse):
+    def __init__(
+        self,
+        path: str,
+        ranges: Sequence[Tuple[int, int]],
+        file_size: int,
+        headers: Union[None, Mapping[str, str]] = None,
+        media_type: str = "application/octet-stream",
+    ):
+        """
+        多区间文件下载响应类初始化函数, 以multipart/byteranges格式返回多个区间
+
+        Args:
+            path: 文件路径
+            ranges: 区间列表, 每个区间为(起始偏移, 结束偏移(含))
+            file_size: 文件大小
+            headers: 响应头, 默认为None
+            media_type: 各区间的媒体类型, 默认为application/octet-stream
+        """
+        boundary = public_func.generate_uuid()
+        headers = dict(headers or {})
+        headers.pop("content-length", None)
+        super(MultipartSendfileResponse, self).__init__(
+            path,
+            0,
+            0,
+            206,
+            headers,
+            f"multipart/byteranges; boundary={boundary}",
+        )
+
+        self._parts = []
+        for index, (start, end) in enumerate(ranges):
+            # 除第一个区间外, 分隔符前都需要换行
+            delimiter = "" if index == 0 else "\r\n"
+            prefix = (
+                f"{delimiter}--{boundary}\r\n"
+                f"content-type: {media_type}\r\n"
+                f"content-range: bytes {start}-{end}/{file_size}\r\n\r\n"
+            )
+            self._parts.append((prefix.encode("latin-1"), start, end - start + 1))
+        self._trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+
+        content_length = len(self._trailer) + sum(
+            len(prefix) + count for prefix, _, count in self._parts
+        )
+        self.headers["content-length"] = str(content_length)
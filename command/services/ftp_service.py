@@ -1,5 +1,6 @@
 __all__ = ["FtpService"]
 
+import os
 import sys
 import time
 from typing import Union
@@ -7,22 +8,22 @@ from multiprocessing import Queue
 from threading import Thread
 
 from pyftpdlib.authorizers import DummyAuthorizer
-from pyftpdlib.handlers import FTPHandler
-from pyftpdlib.servers import FTPServer
+from pyftpdlib import handlers
+from pyftpdlib.handlers import FTPHandler, DTPHandler
+from pyftpdlib.servers import FTPServer, ThreadedFTPServer
 
 from ._base_service import BaseService
 from model.file import FileModel, DirModel
+from model.public_types import FtpServerMode
 from settings import settings
-
-
-class UuidServerMode(dict):
-    pass
+from utils.logger import sysLogger
 
 
 class FtpService(BaseService):
     def __init__(self, input_q: Queue, output_q: Queue):
         """
-        FTP共享服务类初始化函数
+        FTP共享服务类初始化函数, 所有FTP分享由同一个FTP服务提供, 每个分享对应一个以其uuid为用户名的用户,
+        用户的根目录为分享的FTP根路径, 添加分享无需再开启新的监听端口和线程
 
         Args:
             input_q: 输入的进程队列
@@ -30,7 +31,8 @@ class FtpService(BaseService):
         """
         super(FtpService, self).__init__(input_q, output_q)
         self._service_name = "FTP"
-        self._uuid_ftpServer_params = UuidServerMode()
+        self._authorizer = DummyAuthorizer()
+        self._ftpServer: Union[None, FTPServer] = None
 
     def _add_share(self, fileObj: Union[FileModel, DirModel]) -> None:
         """
@@ -44,20 +46,20 @@ class FtpService(BaseService):
         """
         self._sysLogger_debug(f"开始添加分享, 分享路径: {fileObj.targetPath}")
         self._sharing_dict.update({fileObj.uuid: fileObj})
-        need_start_new_server: bool = True
-        for ftpServer in self._uuid_ftpServer_params.values():
-            if ftpServer.address[1] == fileObj.ftp_port:
-                need_start_new_server = False
-                self._sysLogger_debug(f"找到可复用的FTP, 添加分享完成, 分享路径: {fileObj.targetPath}")
-                break
-
-        if need_start_new_server:
-            self._sysLogger_debug(f"未找到可复用FTP, 正在开启新的FTP, 分享路径: {fileObj.targetPath}")
-            self._start_new_server(fileObj)
+        if self._authorizer.has_user(fileObj.uuid):
+            self._authorizer.remove_user(fileObj.uuid)
+        self._authorizer.add_user(
+            fileObj.uuid, fileObj.ftp_pwd, fileObj.ftp_basePath, perm="elr"
+        )
+
+        if self._ftpServer is None:
+            self._sysLogger_debug(f"正在开启FTP, 端口: {settings.FTP_PORT}")
+            self._start_server()
+        self._sysLogger_debug(f"添加分享完成, 分享路径: {fileObj.targetPath}")
 
     def _remove_share(self, uuid: str) -> None:
         """
-        移除共享文件或文件夹
+        移除共享文件或文件夹, FTP服务保持开启, 仅移除该分享的用户
 
         Args:
             uuid: 待移除共享文件或文件夹的uuid
@@ -68,44 +70,69 @@ class FtpService(BaseService):
         self._sysLogger_debug(f"开始移除分享, 分享的uuid: {uuid}")
         if uuid in self._sharing_dict:
             del self._sharing_dict[uuid]
+        if self._authorizer.has_user(uuid):
+            self._authorizer.remove_user(uuid)
+        self._sysLogger_debug(f"移除分享完成, 分享的uuid: {uuid}")
+
+    def _create_handler(self) -> type:
+        """
+        生成该FTP服务专用的FTPHandler子类, 各项调优配置只作用于子类, 不修改pyftpdlib共用的FTPHandler/DTPHandler类
+
+        Returns:
+            type: FTPHandler子类
+        """
+        dtp_handler = type(
+            "ShareDTPHandler",
+            (DTPHandler,),
+            {
+                "ac_in_buffer_size": settings.FTP_IN_BUFFER_SIZE,
+                "ac_out_buffer_size": settings.FTP_OUT_BUFFER_SIZE,
+            },
+        )
+        handler_attrs = {
+            "authorizer": self._authorizer,
+            "dtp_handler": dtp_handler,
+            # 非posix系统(如Windows)下pyftpdlib不提供sendfile, 开启后下载时会出错
+            "use_sendfile": settings.FTP_USE_SENDFILE and handlers.sendfile is not None,
+        }
+        if settings.FTP_PASSIVE_PORTS:
+            start_port, end_port = settings.FTP_PASSIVE_PORTS
+            handler_attrs["passive_ports"] = list(range(start_port, end_port + 1))
+
+        return type("ShareFTPHandler", (FTPHandler,), handler_attrs)
+
+    def _get_server_class(self) -> type:
+        """
+        按配置的并发模式获取FTP服务类, 多线程/多进程模式下每个连接由单独的线程/进程处理,
+        多进程模式在接受连接时才创建进程, 之后添加/移除的分享用户对新连接同样生效
 
-        ftpServer = self._uuid_ftpServer_params.get(uuid)
-        if ftpServer is None:
-            self._sysLogger_debug(f"移除的分享是复用了别的FTP, 移除分享完成, 分享的uuid: {uuid}")
-            return
-
-        need_close_server = True
-        for fileObj in self._sharing_dict.values():
-            if fileObj.ftp_port == ftpServer.address[1]:
-                need_close_server = False
-                self._uuid_ftpServer_params[fileObj.uuid] = ftpServer
-                self._sysLogger_debug(f"移除的分享的FTP被复用, 已将FTP转移, 移除分享完成, 分享的uuid: {uuid}")
-                break
-
-        if need_close_server:
-            self._uuid_ftpServer_params[uuid].close_when_done()
-            self._sysLogger_debug(f"移除的分享未复用FTP也未被复用, 移除分享完成, 分享的uuid: {uuid}")
-        del self._uuid_ftpServer_params[uuid]
-
-    def _start_new_server(self, fileObj: Union[FileModel, DirModel]) -> None:
-        host: str = settings.LOCAL_HOST
-        port: int = fileObj.ftp_port
-        passwd: str = fileObj.ftp_pwd
-
-        authorizer = DummyAuthorizer()
-        authorizer.add_user("a", passwd, fileObj.ftp_basePath, perm="elr")
-        handler = FTPHandler
-        handler.authorizer = authorizer
-        address: tuple = (host, port)
-
-        server = FTPServer(address, handler)
-        t = Thread(target=server.serve_forever)
+        Returns:
+            type: FTP服务类
+        """
+        server_mode = settings.FTP_SERVER_MODE
+        if server_mode is FtpServerMode.single:
+            return FTPServer
+        if server_mode is FtpServerMode.process:
+            if os.name == "posix":
+                from pyftpdlib.servers import MultiprocessFTPServer
+
+                return MultiprocessFTPServer
+            sysLogger.warning(f"[{self._service_name}] 当前系统不支持多进程模式, 退回到多线程模式")
+
+        return ThreadedFTPServer
+
+    def _start_server(self) -> None:
+        address: tuple = (settings.LOCAL_HOST, settings.FTP_PORT)
+
+        server_class = self._get_server_class()
+        self._sysLogger_debug(f"FTP服务并发模式: {server_class.__name__}")
+        self._ftpServer = server_class(address, self._create_handler())
+        self._ftpServer.max_cons = settings.FTP_MAX_CONS
+        self._ftpServer.max_cons_per_ip = settings.FTP_MAX_CONS_PER_IP
+        t = Thread(target=self._ftpServer.serve_forever)
         t.setDaemon(True)
         t.start()
 
-        self._uuid_ftpServer_params[fileObj.uuid] = server
-        self._sysLogger_debug(f"添加分享完成, 分享路径: {fileObj.targetPath}")
-
     def run(self) -> None:
         """
         FTP服务进程运行入口函数
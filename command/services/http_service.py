@@ -1,20 +1,34 @@
 __all__ = ["HttpService"]
 
 import os
-import re
-from typing import Union, Any, AsyncGenerator, Dict
+import time
+import asyncio
+from threading import Thread, RLock
+from typing import Union, Any, Awaitable, Callable, Dict, Set, Tuple
 from multiprocessing import Queue
 from urllib.parse import quote
 from email.utils import formatdate
 
-import aiofiles
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, StreamingResponse, Response
-from starlette.types import Scope
+from fastapi import FastAPI, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from ._base_service import BaseService
+from ._archive import ArchiveResponse, collect_archive_entries
+from ._fs_watcher import create_fs_watcher
+from ._sendfile import (
+    parse_range_header,
+    generate_etag,
+    is_not_modified,
+    is_range_fresh,
+    SendfileMiddleware,
+    SendfileResponse,
+    MultipartSendfileResponse,
+)
 from model import public_types as ptype
 from model.file import FileModel, DirModel
+from model.share_index import dump_share_index, load_share_index
 from settings import settings
 from utils.logger import sharerLogger, sysLogger
 
@@ -37,6 +51,35 @@ class MyRequest:
         return self.__dict__.get(item, "")
 
 
+class PureASGIMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        dispatch: Callable[[Request], Awaitable[Union[None, Response]]],
+    ):
+        """
+        纯ASGI中间件类初始化函数, 与`@app.middleware("http")`不同, 后续视图的响应消息原样透传,
+        不会被转为内存流, 零拷贝发送等ASGI扩展消息才能到达服务器
+
+        Args:
+            app: 后续的ASGI应用
+            dispatch: 中间件处理函数, 返回response对象则直接响应, 返回None则交给后续视图
+        """
+        self._app = app
+        self._dispatch = dispatch
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+
+        response = await self._dispatch(Request(scope, receive))
+        if response is None:
+            await self._app(scope, receive, send)
+        else:
+            await response(scope, receive, send)
+
+
 class HttpService(BaseService):
     def __init__(self, input_q: Queue, output_q: Queue):
         """
@@ -49,6 +92,27 @@ class HttpService(BaseService):
         super(HttpService, self).__init__(input_q, output_q)
         self._service_name = "HTTP"
         self._app = None
+        # 所有分享及其下级文件/文件夹的扁平索引, 请求时按uuid一次查找即可
+        self._file_index: Dict[str, Union[FileModel, DirModel]] = {}
+        # 已完整扫描过的分享文件夹的uuid
+        self._scanned_shares: Set[str] = set()
+        # 各分享文件夹完整扫描的锁, 同时查找未知uuid的请求只扫描一次
+        self._scan_locks: Dict[str, asyncio.Lock] = {}
+        # 已编码的文件列表数据缓存, key为(uuid, 展开层数, 分页起始位置, 分页个数),
+        # value为(生成时各文件夹的修改时间, 编码后的响应内容)
+        self._listing_cache: Dict[
+            Tuple[str, int, int, Union[None, int]], Tuple[Tuple[int, ...], bytes]
+        ] = {}
+        self._listing_cache_size = 1024
+        # 列表缓存每次被清除时加1, 生成列表期间缓存被清除过则不写入缓存, 避免写入变化前的旧数据
+        self._listing_cache_version = 0
+        # 已扫描文件夹的变化监听, 在服务进程中创建
+        self._fs_watcher = None
+        # 文件树发生变化、需重新写入索引文件的分享的uuid
+        self._dirty_shares: Set[str] = set()
+        # 分享、扁平索引、列表缓存等会被监听线程、扫描线程和事件循环同时访问, 修改及多步读取时需持有该锁,
+        # 锁内只做内存操作, 扫描文件夹等IO在锁外进行, 不会长时间阻塞事件循环
+        self._index_lock = RLock()
 
     def _add_share(self, fileObj: Union[FileModel, DirModel]) -> None:
         """
@@ -61,7 +125,16 @@ class HttpService(BaseService):
             None
         """
         self._sysLogger_debug(f"开始添加分享, 分享路径: {fileObj.targetPath}")
-        self._sharing_dict.update({fileObj.uuid: fileObj})
+        if fileObj.isDir:
+            restored = load_share_index(fileObj)
+            self._sysLogger_debug(f"由索引文件恢复了{restored}个文件夹, 分享路径: {fileObj.targetPath}")
+        with self._index_lock:
+            # 重复添加的分享需先清除旧的索引和缓存
+            if fileObj.uuid in self._sharing_dict:
+                self._unindex_share(self._sharing_dict[fileObj.uuid])
+            self._scanned_shares.discard(fileObj.uuid)
+            self._sharing_dict.update({fileObj.uuid: fileObj})
+        self._index_share(fileObj)
         self._sysLogger_debug(f"添加分享完成, 分享路径: {fileObj.targetPath}")
 
     def _remove_share(self, uuid: str) -> None:
@@ -75,10 +148,168 @@ class HttpService(BaseService):
             None
         """
         self._sysLogger_debug(f"开始移除分享, 分享的uuid: {uuid}")
-        if uuid in self._sharing_dict:
-            del self._sharing_dict[uuid]
+        with self._index_lock:
+            if uuid in self._sharing_dict:
+                self._unindex_share(self._sharing_dict[uuid])
+                del self._sharing_dict[uuid]
+            self._scanned_shares.discard(uuid)
+            self._scan_locks.pop(uuid, None)
         self._sysLogger_debug(f"移除分享完成, 分享的uuid: {uuid}")
 
+    def _index_share(self, fileObj: Union[FileModel, DirModel]) -> None:
+        """
+        将共享文件或文件夹及其所有下级加入扁平索引
+
+        Args:
+            fileObj: 共享文件或文件夹对象
+
+        Returns:
+            None
+        """
+        scanned_dirs = []
+        with self._index_lock:
+            for obj in fileObj.iter_tree():
+                self._file_index[obj.uuid] = obj
+                if obj.isDir and obj.isScanned:
+                    scanned_dirs.append(obj)
+        # 轮询监听添加文件夹时需扫描该文件夹, 在锁外进行
+        for obj in scanned_dirs:
+            self._watch_dir(obj, True)
+        # 文件夹的下级是按需扫描的, 扫描完成后再加入索引
+        if fileObj.isDir:
+            fileObj.on_children_loaded(self._index_children)
+
+    def _index_children(self, dirObj: DirModel) -> None:
+        """
+        将文件夹新扫描出的下级加入扁平索引
+
+        Args:
+            dirObj: 完成扫描的文件夹对象
+
+        Returns:
+            None
+        """
+        # 由扫描线程回调, 需与事件循环中的读取互斥
+        with self._index_lock:
+            for child in dirObj.children.values():
+                self._file_index[child.uuid] = child
+            self._dirty_shares.add(dirObj.shareRoot.uuid)
+        self._watch_dir(dirObj, True)
+
+    def _unindex_share(self, fileObj: Union[FileModel, DirModel]) -> None:
+        """
+        将共享文件或文件夹及其所有下级移出扁平索引, 并清除对应的文件列表数据缓存
+
+        Args:
+            fileObj: 共享文件或文件夹对象
+
+        Returns:
+            None
+        """
+        uuids = set()
+        for obj in fileObj.iter_tree():
+            self._file_index.pop(obj.uuid, None)
+            uuids.add(obj.uuid)
+            if obj.isDir and obj.isScanned:
+                self._watch_dir(obj, False)
+        self._clear_listing_cache(uuids)
+
+    def _watch_dir(self, dirObj: DirModel, is_watch: bool) -> None:
+        """
+        开始/停止监听已扫描文件夹的变化
+
+        Args:
+            dirObj: 已扫描的文件夹对象
+            is_watch: 开始监听还是停止监听
+
+        Returns:
+            None
+        """
+        if self._fs_watcher is None:
+            return
+        if is_watch:
+            self._fs_watcher.add(dirObj.targetPath)
+        else:
+            self._fs_watcher.remove(dirObj.targetPath)
+
+    def _on_fs_changed(self, path: str) -> None:
+        """
+        文件夹发生变化时的回调, 重新扫描该文件夹并就地更新其下级、索引和缓存
+
+        Args:
+            path: 发生变化的文件夹路径
+
+        Returns:
+            None
+        """
+        self._sysLogger_debug(f"监听到文件夹发生变化, 文件夹路径: {path}")
+        with self._index_lock:
+            shareObjs = list(self._sharing_dict.values())
+        for shareObj in shareObjs:
+            if not shareObj.isDir:
+                continue
+            dirObj = shareObj.find_scanned_dir(path)
+            if dirObj is None:
+                continue
+            # 该回调在监听线程中执行, 重新扫描在锁外进行, 索引与缓存的更新在锁内一次完成
+            added, removed = dirObj.refresh_children()
+            # 文件被改写时各文件夹的修改时间不变, 包含该文件夹的上级列表缓存也需清除
+            uuids = set()
+            obj = dirObj
+            while obj is not None:
+                uuids.add(obj.uuid)
+                obj = obj.parent
+            with self._index_lock:
+                for child in added:
+                    self._file_index[child.uuid] = child
+                    # 新增的文件夹还未扫描, 该分享需重新视为未完整扫描
+                    if child.isDir:
+                        self._scanned_shares.discard(shareObj.uuid)
+                for child in removed:
+                    self._unindex_share(child)
+                self._clear_listing_cache(uuids)
+                self._dirty_shares.add(shareObj.uuid)
+            self._sysLogger_debug(
+                f"更新文件夹完成, 新增个数: {len(added)}, 移除个数: {len(removed)}, 文件夹路径: {path}"
+            )
+
+    def _clear_listing_cache(self, uuids: Set[str]) -> None:
+        """
+        清除文件列表数据缓存
+
+        Args:
+            uuids: 需清除缓存的文件夹uuid集合
+
+        Returns:
+            None
+        """
+        with self._index_lock:
+            self._listing_cache_version += 1
+            for cache_key in list(self._listing_cache):
+                if cache_key[0] in uuids:
+                    self._listing_cache.pop(cache_key, None)
+
+    def _save_share_indexes(self) -> None:
+        """
+        定时将文件树发生变化的分享写入索引文件, 服务重启后无需重新扫描
+
+        Returns:
+            None
+        """
+        while True:
+            time.sleep(settings.SHARE_INDEX_SAVE_INTERVAL)
+            while self._dirty_shares:
+                uuid = self._dirty_shares.pop()
+                shareObj = self._sharing_dict.get(uuid)
+                if shareObj is None or not shareObj.isDir:
+                    continue
+                try:
+                    dump_share_index(shareObj)
+                except OSError as e:
+                    sysLogger.error(
+                        f"[{self._service_name}] 写入分享索引文件失败, 分享路径: {shareObj.targetPath}, 错误信息: {e}"
+                    )
+
     def run(self) -> None:
         """
         HTTP服务进程运行入口函数
@@ -86,6 +317,11 @@ class HttpService(BaseService):
         Returns:
             None
         """
+        self._fs_watcher = create_fs_watcher(self._on_fs_changed)
+        self._fs_watcher.start()
+        t = Thread(target=self._save_share_indexes)
+        t.setDaemon(True)
+        t.start()
         self.watch()
         super(HttpService, self).run()
 
@@ -96,7 +332,11 @@ class HttpService(BaseService):
         self._setup()
         self._sysLogger_debug("开启服务")
         uvicorn.run(
-            app=self._app, host=settings.LOCAL_HOST, port=settings.init_wsgi_port()
+            app=SendfileMiddleware(self._app),
+            host=settings.LOCAL_HOST,
+            port=settings.init_wsgi_port(),
+            # 零拷贝发送仅支持uvicorn的h11实现, uvicorn与h11的版本需与requirements.txt一致
+            http="h11",
         )
         self._sysLogger_debug("开启HTTP服务失败")
 
@@ -109,8 +349,30 @@ class HttpService(BaseService):
         """
         self._sysLogger_debug("初始化路由")
         self._setup_middleware()
+        self._setup_exception_handler()
         self._setup_router()
 
+    def _setup_exception_handler(self) -> None:
+        """
+        初始化异常处理, 请求参数校验失败时按统一的errno/errmsg格式返回
+
+        Returns:
+            None
+        """
+
+        async def validation_exception_handler(
+            request: Request, exc: RequestValidationError
+        ) -> Response:
+            errmsg = "; ".join(
+                f"{'.'.join(str(x) for x in error['loc'])}: {error['msg']}"
+                for error in exc.errors()
+            )
+            return JSONResponse({"errno": 400, "errmsg": f"请求参数错误, {errmsg}"})
+
+        self._app.add_exception_handler(
+            RequestValidationError, validation_exception_handler
+        )
+
     def _setup_middleware(self) -> None:
         """
         初始化中间件
@@ -119,28 +381,33 @@ class HttpService(BaseService):
             None
         """
 
-        async def generate_fileObj_recursive(
-            uuid: str, parentObj: Union[None, DirModel] = None
-        ) -> Union[FileModel, DirModel, None]:
-            if parentObj is None:
-                try:
-                    parent_uuid, other_uuid = uuid.split(">", 1)
-                except ValueError:
-                    return self._sharing_dict.get(uuid)
-
-                parentObj = self._sharing_dict.get(parent_uuid)
-                if parentObj is None or not parentObj.isDir:
-                    return None
-                return await generate_fileObj_recursive(other_uuid, parentObj)
-
-            try:
-                parent_uuid, other_uuid = uuid.split(">", 1)
-            except ValueError:
-                return parentObj.get(uuid)
-            parentObj = parentObj.get(parent_uuid)
-            if parentObj is None or not parentObj.isDir:
-                return None
-            return await generate_fileObj_recursive(other_uuid, parentObj)
+        async def find_fileObj(uuid: str) -> Union[FileModel, DirModel, None]:
+            fileObj = self._file_index.get(uuid)
+            if fileObj is not None or not uuid:
+                return fileObj
+
+            # uuid由路径推导, 服务重启后客户端仍可能直接访问还未扫描到的下级, 需扫描其所在的分享后再查找,
+            # 每个分享只完整扫描一次, 之后的未知uuid直接跳过该分享, 并发的请求等待同一次扫描
+            loop = asyncio.get_running_loop()
+            with self._index_lock:
+                shareObjs = list(self._sharing_dict.values())
+            for shareObj in shareObjs:
+                if (
+                    not shareObj.isDir
+                    or shareObj.uuid[0] != uuid[0]
+                    or shareObj.uuid in self._scanned_shares
+                ):
+                    continue
+                lock = self._scan_locks.setdefault(shareObj.uuid, asyncio.Lock())
+                async with lock:
+                    if shareObj.uuid not in self._scanned_shares:
+                        await loop.run_in_executor(None, shareObj.scan_tree, -1)
+                        self._scanned_shares.add(shareObj.uuid)
+                fileObj = self._file_index.get(uuid)
+                if fileObj is not None:
+                    return fileObj
+
+            return None
 
         async def is_download_ftp_without_client(
             shareType: ptype.ShareType, request: MyRequest
@@ -151,8 +418,7 @@ class HttpService(BaseService):
 
             return False
 
-        @self._app.middleware("http")
-        async def complete_middleware(request: Request, cell_next) -> Response:
+        async def complete_middleware(request: Request) -> Union[None, Response]:
             """
             该中间件目前完成以下功能:
             1. 无效/非法路由返回错误链接提示
@@ -164,16 +430,15 @@ class HttpService(BaseService):
 
             Args:
                 request: request对象
-                cell_next: 后续中间件/视图回调函数
 
             Returns:
-                Response: response对象
+                Union[None, Response]: 校验不通过时的response对象, 校验通过则为None
             """
             _request = MyRequest(request.scope)
             client_ip = _request["client"][0] if _request["client"] else "未知IP"
             uri, param = _request["path"].rsplit("/", 1)
             # client_platform = _request["client_platform"]
-            fileObj = await generate_fileObj_recursive(param)
+            fileObj = await find_fileObj(param)
             # 文件是否存在判断
             if fileObj is None or not fileObj.isExists:
                 sharerLogger.warning(
@@ -185,13 +450,26 @@ class HttpService(BaseService):
                 sharerLogger.info(
                     f"用户IP: {client_ip}, 用户访问了文件列表, 文件链接: {fileObj.targetPath}"
                 )
-                self._output_q.put(param)
+                # 分页的后续页和展开下级文件夹的请求不计入浏览次数, 仅分享根对象的首页计入
+                offset = request.query_params.get("offset", "0")
+                if param in self._sharing_dict and offset == "0":
+                    self._output_q.put(param)
             elif uri == ptype.DOWNLOAD_URI:
                 params = request.query_params
                 hit_log = params.get(ptype.HIT_LOG, "false")
+                archive = params.get(ptype.ARCHIVE)
                 if fileObj.shareType is ptype.ShareType.http:
-                    # 下载的若为HTTP分享的文件夹, 需进行是否含hit_log标志校验
-                    if fileObj.isDir and hit_log != "true":
+                    # 下载的若为HTTP分享的文件夹, 打包下载时直接交给视图, 否则需进行是否含hit_log标志校验
+                    if fileObj.isDir and archive is not None:
+                        if archive not in ptype.ArchiveType.__members__:
+                            return JSONResponse(
+                                {"errno": 400, "errmsg": f"不支持的打包格式: {archive}"}
+                            )
+                        if hit_log == "true":
+                            sharerLogger.info(
+                                f"用户IP: {client_ip}, 用户打包下载了文件夹, 文件夹路径: {fileObj.targetPath}"
+                            )
+                    elif fileObj.isDir and hit_log != "true":
                         sharerLogger.warning(f"用户使用非客户端无法直接下载分享的文件夹, 用户IP: {client_ip}")
                         return JSONResponse(
                             {"errno": 400, "errmsg": "无法直接下载文件夹, 请使用客户端进行下载！"}
@@ -225,8 +503,9 @@ class HttpService(BaseService):
                 return JSONResponse({"errno": 404, "errmsg": "访问的链接不存在！"})
 
             request.scope["fileObj"] = fileObj
-            response = await cell_next(request)
-            return response
+            return None
+
+        self._app.add_middleware(PureASGIMiddleware, dispatch=complete_middleware)
 
     def _setup_router(self) -> None:
         """
@@ -236,56 +515,120 @@ class HttpService(BaseService):
             None
         """
 
-        async def file_generator(
-            file_path: str, offset: int, chunk_size: int
-        ) -> AsyncGenerator:
-            async with aiofiles.open(file_path, "rb") as f:
-                await f.seek(offset, os.SEEK_SET)
-                while True:
-                    chunk = await f.read(chunk_size)
-                    if chunk:
-                        yield chunk
-                    else:
-                        break
-
         async def generate_file_stream_response(
             request: Request, fileObj: FileModel
-        ) -> StreamingResponse:
+        ) -> Response:
             stat_result = os.stat(fileObj.targetPath)
             st_size = stat_result.st_size
-            range_str = request.headers.get("range", "")
-            range_match = re.match(r"bytes=(\d+)-", range_str) or re.match(
-                r"bytes=(\d+)-(\d+)", range_str
-            )
-            if range_match:
-                start = int(range_match.group(1))
-                end = (
-                    int(range_match.group(2))
-                    if range_match.lastindex == 2
-                    else st_size - 1
-                )
-            else:
-                start = 0
-                end = st_size - 1
             file_name = quote(fileObj.file_name)
-            content_length = st_size - start
             content_type = "application/octet-stream"
-            return StreamingResponse(
-                file_generator(fileObj.targetPath, start, 1048576),
-                media_type=content_type,
-                headers={
-                    "content-disposition": f"attachment; filename={file_name}",
-                    "accept-ranges": "bytes",
-                    "connection": "keep-alive",
-                    "content-length": str(content_length),
-                    "content-range": f"{start}-{end}/{st_size}",
-                    "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
-                },
-                status_code=206 if start > 0 else 200,
+            etag = generate_etag(stat_result)
+            headers = {
+                "accept-ranges": "bytes",
+                "connection": "keep-alive",
+                "etag": etag,
+                "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+            }
+            if is_not_modified(
+                request.headers.get("if-none-match", ""),
+                request.headers.get("if-modified-since", ""),
+                etag,
+                stat_result.st_mtime,
+            ):
+                return Response(status_code=304, headers=headers)
+
+            headers["content-disposition"] = f"attachment; filename={file_name}"
+            # If-Range校验不通过说明客户端持有的是旧版本文件, 忽略Range返回完整文件
+            if is_range_fresh(
+                request.headers.get("if-range", ""), etag, stat_result.st_mtime
+            ):
+                ranges = parse_range_header(request.headers.get("range", ""), st_size)
+            else:
+                ranges = None
+            if ranges is None:
+                headers["content-length"] = str(st_size)
+                return SendfileResponse(
+                    fileObj.targetPath, 0, st_size, 200, headers, content_type
+                )
+            elif not ranges:
+                headers["content-range"] = f"bytes */{st_size}"
+                return Response(status_code=416, headers=headers)
+            elif len(ranges) == 1:
+                start, end = ranges[0]
+                headers["content-length"] = str(end - start + 1)
+                headers["content-range"] = f"bytes {start}-{end}/{st_size}"
+                return SendfileResponse(
+                    fileObj.targetPath,
+                    start,
+                    end - start + 1,
+                    206,
+                    headers,
+                    content_type,
+                )
+            else:
+                return MultipartSendfileResponse(
+                    fileObj.targetPath, ranges, st_size, headers, content_type
+                )
+
+        async def generate_listing_response(
+            uuid: str,
+            dirObj: DirModel,
+            depth: int,
+            offset: int,
+            limit: Union[None, int],
+        ) -> Response:
+            cache_key = (uuid, depth, offset, limit)
+            # 扫描文件夹可能较慢(如网络文件系统), 放到线程中并行扫描, 不阻塞其他请求
+            await asyncio.get_running_loop().run_in_executor(
+                None, dirObj.scan_tree, depth
             )
+            # 列表中含各文件的大小和修改时间, 文件被就地改写时文件夹的修改时间不变,
+            # 由监听(inotify或轮询)发现此类变化并清除缓存, 没有监听时不可使用缓存
+            use_cache = self._fs_watcher is not None
+            mtimes = dirObj.listing_mtimes(depth)
+            with self._index_lock:
+                cached = self._listing_cache.get(cache_key) if use_cache else None
+                cache_version = self._listing_cache_version
+            if cached is not None and cached[0] == mtimes:
+                return Response(cached[1], media_type="application/json")
+
+            data = await dirObj.to_dict_client(depth, offset, limit)
+            response = JSONResponse({"errno": 200, "errmsg": "", "data": data})
+            if not use_cache:
+                return response
+            with self._index_lock:
+                # 生成列表期间监听线程清除过缓存, 列表可能是变化前的数据, 不写入缓存
+                if cache_version != self._listing_cache_version:
+                    return response
+                if (
+                    cache_key not in self._listing_cache
+                    and len(self._listing_cache) >= self._listing_cache_size
+                ):
+                    self._listing_cache.pop(next(iter(self._listing_cache)), None)
+                self._listing_cache[cache_key] = (mtimes, response.body)
+            return response
 
-        @self._app.get("%s/{uuid}" % ptype.FILE_LIST_URI)
-        async def file_list(uuid: str, request: Request) -> Dict[str, Any]:
+        @self._app.get("%s/{uuid}" % ptype.FILE_LIST_URI, response_model=None)
+        async def file_list(
+            uuid: str,
+            request: Request,
+            offset: int = Query(0, ge=0),
+            limit: Union[None, int] = Query(None, ge=1),
+            depth: int = Query(1, ge=-1),
+        ) -> Union[Dict[str, Any], Response]:
+            """
+            文件列表视图, 默认仅返回一层子级并分页, depth=-1时返回完整的文件树
+
+            Args:
+                uuid: 文件/文件夹的uuid
+                request: request对象
+                offset: 子级分页的起始位置, 默认为0
+                limit: 子级分页的个数, 默认为配置的每页个数, 返回完整文件树时默认不分页
+                depth: 展开的子级层数, 默认为1
+
+            Returns:
+                Union[Dict[str, Any], Response]: 文件列表数据, 文件夹的列表数据会被缓存
+            """
             fileObj = request.scope.get("fileObj")
             fileObj: Union[None, FileModel, DirModel]
             if not fileObj:
@@ -296,13 +639,30 @@ class HttpService(BaseService):
                 )
                 return {"errno": 500, "errmsg": "系统发生错误, 文件/文件夹对象没有被正确传递"}
 
-            data = await fileObj.to_dict_client()
-            return {"errno": 200, "errmsg": "", "data": data}
+            if not fileObj.isDir:
+                data = await fileObj.to_dict_client()
+                return {"errno": 200, "errmsg": "", "data": data}
+
+            if limit is None and depth >= 0:
+                limit = settings.FILE_LIST_PAGE_SIZE
+            return await generate_listing_response(uuid, fileObj, depth, offset, limit)
+
+        async def generate_archive_response(
+            request: Request, dirObj: DirModel
+        ) -> Response:
+            archive_type = ptype.ArchiveType(request.query_params[ptype.ARCHIVE])
+            file_name = quote(f"{dirObj.file_name}.{archive_type.value}")
+            headers = {"content-disposition": f"attachment; filename={file_name}"}
+            # 遍历文件夹需逐个stat, 放到线程中执行, 不阻塞其他请求
+            entries = await asyncio.get_running_loop().run_in_executor(
+                None, collect_archive_entries, dirObj.targetPath
+            )
+            return ArchiveResponse(entries, archive_type, headers)
 
         @self._app.get("%s/{uuid}" % ptype.DOWNLOAD_URI, response_model=None)
         async def download(
             uuid: str, request: Request
-        ) -> Union[Dict[str, Any], StreamingResponse]:
+        ) -> Union[Dict[str, Any], Response]:
             fileObj = request.scope.get("fileObj")
             fileObj: Union[None, FileModel, DirModel]
             if not fileObj:
@@ -314,6 +674,8 @@ class HttpService(BaseService):
                 return {"errno": 500, "errmsg": "系统发生错误, 文件/文件夹对象没有被正确传递"}
 
             if fileObj.shareType is ptype.ShareType.http:
+                if fileObj.isDir:
+                    return await generate_archive_response(request, fileObj)
                 return await generate_file_stream_response(request, fileObj)
             elif fileObj.shareType is ptype.ShareType.ftp:
                 ftp_data = await fileObj.to_ftp_data()
@@ -20,15 +20,21 @@ from settings import settings
 from utils.logger import sysLogger, sharerLogger
 from command.manage import ServiceProcessManager
 from model.sharing import FuseSharingModel
+from model.share_index import remove_share_index
 from model.file import FileModel, DirModel
 from model.public_types import ShareType as shareType
 from model.public_types import ThemeColor as themeColor
-from model.public_types import DownloadStatus
+from model.public_types import DownloadStatus, ShareCreationStatus, ArchiveType
 from model.qt_thread import *
 from model.browse import BrowseFileDictModel
 from model.assert_env import AssertEnvWindow
 from model.tray_icon import TrayIcon
-from utils.public_func import generate_uuid, update_downloadUrl_with_hitLog
+from utils.public_func import (
+    generate_uuid,
+    update_downloadUrl_with_hitLog,
+    update_downloadUrl_with_archive,
+    generate_browseUrl_from_downloadUrl,
+)
 
 
 class MainWindow(QMainWindow):
@@ -174,17 +180,16 @@ class MainWindow(QMainWindow):
             copy_fileDict.update({"relativePath": copy_fileDict["fileName"]})
             sysLogger.debug("给下载路径添加HIT_LOG标志")
             update_downloadUrl_with_hitLog(copy_fileDict)
-            fileList = [copy_fileDict]
-            fileCount = 1
+            self._start_download_fileList([copy_fileDict], 1)
+        elif (
+            settings.HTTP_ARCHIVE_DOWNLOAD
+            and self._browse_data.currentDict["stareType"] == shareType.http.value
+        ):
+            # HTTP分享的文件夹由服务端打包成一个TAR流, 作为一个下载任务边下载边解包
+            self._start_download_fileList([self._generate_archive_fileDict()], 1)
         else:
-            fileList, fileCount = self._generate_fileList_recursive()
-        self._append_download_fileList(fileList)
-
-        sysLogger.info(f"加入下载成功, 此次下载文件个数: {fileCount}")
-        self._ui_function.show_info_messageBox("加入下载成功")
-        self.ui.removeDownloadsButton.setEnabled(True)
-
-        self.ui.downloadDirButton.setEnabled(self._browse_data.isDir)
+            # 浏览时仅加载了当前一层, 下载文件夹前需先加载其完整的文件树
+            self._load_download_tree()
 
     def enter_dir(self, fileDict: Dict[str, Any]) -> None:
         """
@@ -197,6 +202,9 @@ class MainWindow(QMainWindow):
             None
         """
         sysLogger.debug("浏览文件夹被点击, 正在进入该文件夹")
+        if "children" not in fileDict:
+            self._load_dir_children(fileDict)
+            return
         self._browse_data.currentDict = fileDict
         self._UIClass.show_file_list(self, self._browse_data.currentDict)
         self.ui.backupButton.setEnabled(True)
@@ -375,6 +383,8 @@ class MainWindow(QMainWindow):
         self._download_data = DownloadFileDictModel(self)
 
         self._browse_thread = None
+        self._create_share_thread = None
+        self._download_tree_thread = None
         self._download_http_thread = None
         self._download_ftp_thread = None
         sysLogger.info("必要属性初始化成功")
@@ -493,9 +503,16 @@ class MainWindow(QMainWindow):
         sysLogger.debug("更新分享路径文件夹的内容至下拉框完成")
 
     def _create_share(self) -> None:
+        # 创建中再次点击按钮即取消创建
+        if self._create_share_thread is not None:
+            sysLogger.debug("正在取消创建分享")
+            self._create_share_thread.run_flag = False
+            self.ui.createShareButton.setText("取消中。。。")
+            self.ui.createShareButton.setEnabled(False)
+            return
         sysLogger.debug("正在创建分享")
 
-        def _create_share_inner() -> None:
+        def _create_share_inner() -> Union[None, FileModel, DirModel]:
             base_path = self.ui.sharePathEdit.text()
             if not os.path.isdir(base_path):
                 errmsg = "分享的路径不存在！\n建议用按钮打开资源管理器选择路径"
@@ -524,40 +541,6 @@ class MainWindow(QMainWindow):
                     f"该路径已被分享过, 他在分享记录的第 [{shared_row_number + 1}] 行", msg_color="red"
                 )
                 return
-            try:
-                file_count = self._calc_file_count(target_path)
-            except FileNotFoundError as e:
-                sysLogger.warning(f"分享文件中含无法打开路径, 尝试打开发生的错误信息: {e}")
-                self._ui_function.show_info_messageBox(
-                    f"文件路径解析错误, 原始错误信息: {e}", "分享异常", msg_color="red"
-                )
-                return
-            except Exception as e:
-                sysLogger.warning(f"分享异常, 尝试分享发生的错误信息: {e}")
-                self._ui_function.show_info_messageBox(
-                    f"分享出现错误, 原始错误信息: {e}", "分享异常", msg_color="red"
-                )
-                return
-            if file_count > 10000:
-                sysLogger.warning("分享被取消, 因为分享的文件夹中文件个数超过10000, 建议打包后分享压缩文件")
-                self._ui_function.show_info_messageBox(
-                    f"分享已被取消\n该文件夹内文件数量大于10000, 直接分享它不是一个好的选择, 请按需对文件夹进行打包后再分享",
-                    "分享被取消",
-                    msg_color="red",
-                )
-                return
-            elif file_count > 100:
-                if (
-                    self._ui_function.show_question_messageBox(
-                        "文件夹内文件数量大于100, 会影响下载速度, 若无浏览文件需求, 建议打包成压缩包后再分享",
-                        "文件数量大",
-                        "好的, 打包后再分享",
-                        "无视直接分享",
-                    )
-                    == 0
-                ):
-                    sysLogger.info("成功取消文件个数大于100的文件夹的分享")
-                    return
             uuid = f"{share_type.value[0]}{generate_uuid()}"
             fileModel = DirModel if os.path.isdir(target_path) else FileModel
             if share_type is shareType.ftp:
@@ -565,28 +548,94 @@ class MainWindow(QMainWindow):
             else:
                 shared_fileObj = None
             if shared_fileObj is None:
-                fileObj = fileModel(target_path, uuid)
-            else:
-                sysLogger.debug(f"存在可复用的FTP, 其工作路径为: {shared_fileObj.ftp_basePath}")
-                fileObj = fileModel(
-                    target_path,
-                    uuid,
-                    pwd=shared_fileObj.ftp_pwd,
-                    port=shared_fileObj.ftp_port,
-                    ftp_base_path=shared_fileObj.ftp_basePath,
-                )
-            self._sharing_list.append(fileObj)
-            fileObj.isSharing = True
-            sysLogger.debug("正在添加显示一条分享记录数据")
-            self._UIClass.add_share_table_item(self, fileObj)
-            self._service_process.add_share(fileObj)
-            sysLogger.info(f"创建分享成功, 分享路径: {target_path}, 分享类型: {share_type}")
+                return fileModel(target_path, uuid)
+            sysLogger.debug(f"存在可复用的FTP, 其工作路径为: {shared_fileObj.ftp_basePath}")
+            return fileModel(
+                target_path,
+                uuid,
+                pwd=shared_fileObj.ftp_pwd,
+                ftp_base_path=shared_fileObj.ftp_basePath,
+            )
+
+        fileObj = _create_share_inner()
+        if fileObj is None:
+            return
+        if not fileObj.isDir:
+            self._add_share(fileObj)
+            return
+
+        # 文件夹在后台线程中扫描, 按钮显示扫描进度, 再次点击可取消
+        sysLogger.debug("正在初始化创建分享任务并开启")
+        self.ui.createShareButton.setText("取消创建")
+        self._create_share_thread = CreateShareThread(fileObj)
+        self._create_share_thread.signal.connect(self._update_create_share_status)
+        self._create_share_thread.start()
+
+    def _update_create_share_status(
+        self,
+        status_tuple: Tuple[DirModel, ShareCreationStatus, Union[int, str]],
+    ) -> None:
+        fileObj, status, msg = status_tuple
+        if status is ShareCreationStatus.DOING:
+            if (
+                self._create_share_thread is not None
+                and self._create_share_thread.run_flag
+            ):
+                self.ui.createShareButton.setText(f"取消创建({msg})")
+            return
 
-        self.ui.createShareButton.setEnabled(False)
-        self.ui.createShareButton.setText("创建中。。。")
-        _create_share_inner()
+        self._create_share_thread = None
         self.ui.createShareButton.setText("新建分享")
         self.ui.createShareButton.setEnabled(True)
+        if status is ShareCreationStatus.CANCELLED:
+            remove_share_index(fileObj.uuid)
+            sysLogger.info(f"创建分享已被取消, 分享路径: {fileObj.targetPath}")
+            self._ui_function.show_info_messageBox("创建分享已被取消", "分享被取消")
+            return
+        if status is ShareCreationStatus.FAILED:
+            sysLogger.warning(f"分享异常, 尝试分享发生的错误信息: {msg}")
+            self._ui_function.show_info_messageBox(
+                f"分享出现错误, 原始错误信息: {msg}", "分享异常", msg_color="red"
+            )
+            return
+
+        if msg > settings.SHARE_FILE_COUNT_WARNING:
+            if (
+                self._ui_function.show_question_messageBox(
+                    f"该文件夹内文件数量为{msg}, 大于{settings.SHARE_FILE_COUNT_WARNING}, 下载整个文件夹会比较慢, 建议按需对文件夹进行打包后再分享",
+                    "文件数量很大",
+                    "好的, 打包后再分享",
+                    "无视直接分享",
+                )
+                == 0
+            ):
+                # 未确认分享的文件夹不保留索引文件
+                remove_share_index(fileObj.uuid)
+                sysLogger.info(f"成功取消文件个数大于{settings.SHARE_FILE_COUNT_WARNING}的文件夹的分享")
+                return
+        elif msg > 100:
+            if (
+                self._ui_function.show_question_messageBox(
+                    "文件夹内文件数量大于100, 会影响下载速度, 若无浏览文件需求, 建议打包成压缩包后再分享",
+                    "文件数量大",
+                    "好的, 打包后再分享",
+                    "无视直接分享",
+                )
+                == 0
+            ):
+                # 未确认分享的文件夹不保留索引文件
+                remove_share_index(fileObj.uuid)
+                sysLogger.info("成功取消文件个数大于100的文件夹的分享")
+                return
+        self._add_share(fileObj)
+
+    def _add_share(self, fileObj: Union[FileModel, DirModel]) -> None:
+        self._sharing_list.append(fileObj)
+        fileObj.isSharing = True
+        sysLogger.debug("正在添加显示一条分享记录数据")
+        self._UIClass.add_share_table_item(self, fileObj)
+        self._service_process.add_share(fileObj)
+        sysLogger.info(f"创建分享成功, 分享路径: {fileObj.targetPath}, 分享类型: {fileObj.shareType}")
 
     def _load_browse_url(self) -> None:
         sysLogger.debug("正在加载分享链接")
@@ -665,6 +714,38 @@ class MainWindow(QMainWindow):
         self.ui.shareLinkButton.setEnabled(True)
         sysLogger.info("加载文件列表完成")
 
+    def _load_dir_children(self, fileDict: Dict[str, Any]) -> None:
+        sysLogger.debug("文件夹的子级还未加载, 正在按需加载")
+        if self._browse_thread is not None:
+            self._browse_thread.run_flag = False
+            self._browse_thread.quit()
+        browse_url = generate_browseUrl_from_downloadUrl(fileDict)
+        self._browse_thread = LoadBrowseUrlThread(browse_url)
+        self._browse_thread.signal.connect(
+            lambda browse_response: self._show_dir_children(fileDict, browse_response)
+        )
+        self._browse_thread.start()
+        sysLogger.debug("加载文件夹子级任务开启成功")
+
+    def _show_dir_children(
+        self, fileDict: Dict[str, Any], browse_response: Dict[str, Any]
+    ) -> None:
+        sysLogger.debug("正在显示按需加载的文件夹子级")
+        self._browse_thread = None
+        errno = browse_response.get("errno") if browse_response else None
+        if errno == 200 and self._verify_data(browse_response.get("data", {})):
+            BrowseFileDictModel.load_children(fileDict, browse_response["data"])
+            self.enter_dir(fileDict)
+        elif errno == 404:
+            sysLogger.warning("来晚了, 分享的文件夹已被删除")
+            self._UIClass.show_not_found_browse(self)
+        elif errno is None:
+            sysLogger.warning("分享服务器异常, 未能连接服务器或服务器返回非法数据")
+            self._UIClass.show_error_browse(self)
+        else:
+            sysLogger.warning(f"分享服务器存在异常, 返回的response: {browse_response}")
+            self._UIClass.show_server_error_browse(self)
+
     def _backup_button_clicked(self) -> None:
         sysLogger.debug("正在返回上一级目录")
         self._browse_data.prev()
@@ -672,34 +753,83 @@ class MainWindow(QMainWindow):
         self.ui.backupButton.setEnabled(not self._browse_data.isRoot)
         sysLogger.debug("返回上一级路径完成")
 
-    def _generate_fileList_recursive(self) -> Tuple[List[Dict[str, Any]], int]:
+    def _load_download_tree(self) -> None:
+        sysLogger.debug("下载的是文件夹, 正在加载其完整的文件树")
+        browse_url = generate_browseUrl_from_downloadUrl(self._browse_data.currentDict)
+        self._download_tree_thread = LoadBrowseUrlThread(browse_url, -1)
+        self._download_tree_thread.signal.connect(self._download_dir_tree)
+        self._download_tree_thread.start()
+        sysLogger.debug("加载文件夹完整文件树任务开启成功")
+
+    def _download_dir_tree(self, browse_response: Dict[str, Any]) -> None:
+        sysLogger.debug("文件夹的完整文件树加载完成, 正在创建下载任务")
+        self._download_tree_thread = None
+        browse_data = browse_response.get("data", {}) if browse_response else {}
+        if browse_response.get("errno") != 200 or not self._verify_data(browse_data):
+            sysLogger.warning(f"加载文件夹的完整文件树失败, 返回的response: {browse_response}")
+            self._ui_function.show_info_messageBox(
+                "加入下载失败, 未能获取该文件夹的文件列表", msg_color="red"
+            )
+            self.ui.downloadDirButton.setEnabled(self._browse_data.isDir)
+            return
+        fileList, fileCount = self._generate_fileList_recursive(browse_data)
+        self._start_download_fileList(fileList, fileCount)
+
+    def _start_download_fileList(
+        self, fileList: Sequence[Dict[str, Any]], fileCount: int
+    ) -> None:
+        self._append_download_fileList(fileList)
+
+        sysLogger.info(f"加入下载成功, 此次下载文件个数: {fileCount}")
+        self._ui_function.show_info_messageBox("加入下载成功")
+        self.ui.removeDownloadsButton.setEnabled(True)
+
+        self.ui.downloadDirButton.setEnabled(self._browse_data.isDir)
+
+    def _generate_archive_fileDict(self) -> Dict[str, Any]:
+        sysLogger.debug("下载的是HTTP分享的文件夹, 正在生成打包下载任务")
+        archive_fileDict = {
+            key: value
+            for key, value in self._browse_data.currentDict.items()
+            if key not in ("children", "prev")
+        }
+        archive_fileDict.update({"relativePath": archive_fileDict["fileName"]})
+        sysLogger.debug("给下载路径添加HIT_LOG和打包格式标志")
+        update_downloadUrl_with_hitLog(archive_fileDict)
+        update_downloadUrl_with_archive(archive_fileDict, ArchiveType.tar)
+        return archive_fileDict
+
+    def _generate_fileList_recursive(
+        self, dir_fileDict: Dict[str, Any]
+    ) -> Tuple[List[Dict[str, Any]], int]:
         sysLogger.debug("下载的是文件夹, 正在获取下载文件列表和文件个数")
 
         def _generate_fileList_recursive_inner(
-            fileList: List[Dict[str, Any]], fileDict: Dict[str, Any]
+            fileList: List[Dict[str, Any]], fileDict: Dict[str, Any], dir_name: str
         ) -> List[Dict[str, Any]]:
-            copy_fileDict = copy.deepcopy(fileDict)
-            dir_name = copy_fileDict["fileName"]
-            for children in copy_fileDict["children"]:
+            for child in fileDict["children"]:
+                children = [x for x in child.values()][0]
                 relativePath = os.path.join(dir_name, children["fileName"])
                 if children["isDir"]:
-                    children.update({"fileName": relativePath})
-                    _generate_fileList_recursive_inner(fileList, children)
+                    _generate_fileList_recursive_inner(fileList, children, relativePath)
                 else:
-                    children.update({"relativePath": relativePath})
-                    fileList.append(children)
+                    copy_children = copy.copy(children)
+                    copy_children.update({"relativePath": relativePath})
+                    fileList.append(copy_children)
 
                 QApplication.processEvents()
 
             return fileList
 
-        current_fileDict = self._browse_data.currentDict
-        parent_fileDict = copy.copy(current_fileDict)
+        parent_fileDict = copy.copy(dir_fileDict)
+        parent_fileDict.pop("children", None)
         sysLogger.debug("给下载路径添加HIT_LOG标志")
         update_downloadUrl_with_hitLog(parent_fileDict)
         fileList = [parent_fileDict]
 
-        fileList = _generate_fileList_recursive_inner(fileList, parent_fileDict)
+        fileList = _generate_fileList_recursive_inner(
+            fileList, dir_fileDict, dir_fileDict["fileName"]
+        )
         sysLogger.debug("获取文件下载列表和文件个数完成")
         return fileList, len(fileList) - 1
 
@@ -747,19 +877,11 @@ class MainWindow(QMainWindow):
         isDir = data.get("isDir")
         if isDir is None:
             return False
-        if isDir:
-            other_full_keys = [
-                "uuid",
-                "downloadUrl",
-                "fileName",
-                "stareType",
-                "children",
-            ]
-        else:
-            other_full_keys = ["uuid", "downloadUrl", "fileName", "stareType"]
+        other_full_keys = ["uuid", "downloadUrl", "fileName", "stareType"]
         if not all(key in data for key in other_full_keys):
             return False
-        if isDir:
+        # 超出加载层数的文件夹没有children, 进入时再按需加载
+        if isDir and "children" in data:
             for child in data["children"]:
                 try:
                     if len(child) != 1:
@@ -771,25 +893,6 @@ class MainWindow(QMainWindow):
 
         return status
 
-    def _calc_file_count(self, base_path: str, initial_count: int = 0) -> int:
-        sysLogger.debug("正在计算文件夹下文件个数")
-        if not os.path.isdir(base_path):
-            return 1
-        else:
-            for file_name in os.listdir(base_path):
-                file_path = os.path.join(base_path, file_name)
-                try:
-                    initial_count += self._calc_file_count(file_path)
-                except:
-                    raise
-                else:
-                    if initial_count > 10000:
-                        return initial_count
-
-                QApplication.processEvents()
-
-        return initial_count
-
     def _update_download_status(
         self, status_tuple: Tuple[Dict[str, Any], DownloadStatus, str]
     ) -> None:
@@ -10,7 +10,10 @@ a = Analysis(
         PROJECT_PATH + 'main.py',
         PROJECT_PATH + "command\\manage.py",
         PROJECT_PATH + "command\\services\\__init__.py",
+        PROJECT_PATH + "command\\services\\_archive.py",
         PROJECT_PATH + "command\\services\\_base_service.py",
+        PROJECT_PATH + "command\\services\\_fs_watcher.py",
+        PROJECT_PATH + "command\\services\\_sendfile.py",
         PROJECT_PATH + "command\\services\\ftp_service.py",
         PROJECT_PATH + "command\\services\\http_service.py",
         PROJECT_PATH + "exceptions\\__init__.py",
@@ -19,6 +22,7 @@ a = Analysis(
         PROJECT_PATH + "model\\file.py",
         PROJECT_PATH + "model\\public_types.py",
         PROJECT_PATH + "model\\qt_thread.py",
+        PROJECT_PATH + "model\\share_index.py",
         PROJECT_PATH + "model\\sharing.py",
         PROJECT_PATH + "settings\\__init__.py",
         PROJECT_PATH + "settings\\_base.py",
@@ -27,8 +31,10 @@ a = Analysis(
         PROJECT_PATH + "static\\ui\\main_ui.py",
         PROJECT_PATH + "static\\ui\\main_qrc.py",
         PROJECT_PATH + "utils\\custom_grips.py",
+        PROJECT_PATH + "utils\\http_client.py",
         PROJECT_PATH + "utils\\logger.py",
         PROJECT_PATH + "utils\\public_func.py",
+        PROJECT_PATH + "utils\\tar_stream.py",
         PROJECT_PATH + "utils\\ui_function.py",
     ],
     pathex=[PROJECT_PATH],
@@ -99,8 +99,29 @@ class BrowseFileDictModel(dict):
         sysLogger.debug("读取分享链接的数据完成")
         return model
 
+    @classmethod
+    def load_children(cls, fileDict: Dict[str, Any], data: Dict[str, Any]) -> None:
+        """
+        加载按需请求的文件夹子级数据到目录集中
+
+        Args:
+            fileDict: 待加载子级的文件夹对象
+            data: 该文件夹的分享链接数据
+
+        Returns:
+            None
+        """
+        sysLogger.debug("开始读取文件夹子级的数据")
+        fileDict["children"] = data.get("children", [])
+        fileDict["total"] = data.get("total", len(fileDict["children"]))
+        cls._load_dict_recursive(fileDict)
+        sysLogger.debug("读取文件夹子级的数据完成")
+
     @classmethod
     def _load_dict_recursive(cls, data: dict) -> dict:
+        # 超出加载层数的文件夹没有children, 在进入该文件夹时再按需加载
+        if "children" not in data:
+            return data
         children = data["children"]
         data["children"] = []
         for child in children:
@@ -1,15 +1,59 @@
 __all__ = ["FileModel", "DirModel"]
 
 import os
-import random
-from typing import Any, Union, Dict
+from itertools import islice
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Union, Dict, Iterable, Iterator, List, Tuple
 
 from model import public_types as ptype
 from settings import settings
 from utils import public_func
 
+# 文件夹可能被多个线程同时扫描, 仅保留最先完成的扫描结果
+_children_lock = Lock()
+
+
+class _ShareInfo:
+    # 分享级别的配置与状态, 由同一分享下的所有文件/文件夹对象共用一份, 不再复制到每个子级
+    __slots__ = (
+        "share_type",
+        "ftp_pwd",
+        "ftp_base_path",
+        "browse_number",
+        "is_sharing",
+        "row_index",
+        "on_children_loaded",
+    )
+
+    def __init__(
+        self,
+        share_type: ptype.ShareType,
+        ftp_pwd: Union[None, str],
+        ftp_base_path: Union[None, str],
+    ):
+        """
+        分享信息类初始化函数
+
+        Args:
+            share_type: 分享的类型
+            ftp_pwd: FTP服务的密码, 若不是FTP共享则为None
+            ftp_base_path: FTP服务的根路径, 若不是FTP共享则为None
+        """
+        self.share_type = share_type
+        self.ftp_pwd = ftp_pwd
+        self.ftp_base_path = ftp_base_path
+        self.browse_number = 0
+        self.is_sharing = False
+        self.row_index: Union[None, int] = None
+        self.on_children_loaded: Union[None, Callable[["DirModel"], None]] = None
+
 
 class FileModel:
+    # 大型分享中每个文件都对应一个对象, 使用__slots__且只保存uuid、文件名、父级、分享信息和扫描时的大小与修改时间,
+    # 分享根路径以外的路径均按父级拼接得出, 目标为每个文件/文件夹(含其在父级children中的索引)占用不超过256字节
+    __slots__ = ("_uuid", "_name", "_parent", "_share", "_size", "_mtime_ns")
+
     def __init__(
         self,
         path: str,
@@ -28,46 +72,66 @@ class FileModel:
             uuid: 文件uuid
             parent_uuid: 父级文件夹的uuid, 若无父级则为None, 默认为None
             pwd: FTP服务的密码, 若不是FTP共享则为None, 默认为None
-            port: FTP服务的端口, 若不是FTP共享则为None, 默认为None
+            port: 已废弃, 所有FTP分享共用一个FTP服务, 仅为兼容旧的分享记录保留, 默认为None
             ftp_base_path: FTP服务的根路径, 若不是FTP共享则为None, 默认为None
             **kwargs: 其他关键字参数
         """
-        self._uuid = f"{parent_uuid}>{uuid}" if parent_uuid else uuid
-        self._target_path = path.rstrip(os.sep) if path.endswith(os.sep) else path
-        self._browse_number = 0
-        self._is_sharing = False
-        self._row_index = None
-        self._ftp_pwd = pwd
-        self._ftp_port = port
+        # uuid全局唯一, 不再拼接父级的uuid, 服务端可直接按uuid一次查找到任意层级的文件对象
+        self._uuid = uuid
+        # 分享根对象保存完整路径, 下级对象仅保存文件名
+        self._name = path.rstrip(os.sep) if path.endswith(os.sep) else path
+        self._parent: Union[None, "DirModel"] = None
+        # 扫描时取得的文件大小和修改时间(纳秒), 未知时分别为None和-1
+        self._size: Union[None, int] = None
+        self._mtime_ns = -1
 
         if self._uuid[0] == "h":
-            self._share_type = ptype.ShareType.http
+            share_type = ptype.ShareType.http
         else:
-            self._share_type = ptype.ShareType.ftp
+            share_type = ptype.ShareType.ftp
 
-        if self._share_type is ptype.ShareType.ftp:
-            self._ftp_base_path = (
-                ftp_base_path if ftp_base_path else os.path.dirname(self._target_path)
-            )
-            if self._ftp_port is None:
-                self._ftp_port = self._generate_ftp_port()
-            if self._ftp_pwd is None:
-                self._ftp_pwd = public_func.generate_ftp_passwd()
+        if share_type is ptype.ShareType.ftp:
+            ftp_base_path = ftp_base_path or self._default_ftp_base_path()
+            if pwd is None:
+                pwd = public_func.generate_ftp_passwd()
         else:
-            self._ftp_base_path = None
+            ftp_base_path = None
+        self._share = _ShareInfo(share_type, pwd, ftp_base_path)
 
-    def _generate_ftp_port(self) -> int:
+    @classmethod
+    def _new_child(
+        cls,
+        parent: "DirModel",
+        name: str,
+        stat_result: Union[None, os.stat_result] = None,
+    ) -> "FileModel":
         """
-        生成FTP服务端口
+        创建下级文件/文件夹对象, 与父级共用分享信息
+
+        Args:
+            parent: 父级文件夹对象
+            name: 文件/文件夹名
+            stat_result: 扫描时取得的stat结果, 未知时为None, 默认为None
 
         Returns:
-            int: FTP服务器端口
-        """
-        port = random.randint(10000, 65500)
-        if not public_func.exists_port(port):
-            return port
+            FileModel: 下级文件/文件夹对象
+        """
+        child = cls.__new__(cls)
+        child._uuid = public_func.generate_child_uuid(parent._uuid, name)
+        child._name = name
+        child._parent = parent
+        child._share = parent._share
+        child._set_stat(stat_result)
+        return child
+
+    def _set_stat(self, stat_result: Union[None, os.stat_result]) -> None:
+        if stat_result is None:
+            self._size, self._mtime_ns = None, -1
         else:
-            return self._generate_ftp_port()
+            self._size, self._mtime_ns = stat_result.st_size, stat_result.st_mtime_ns
+
+    def _default_ftp_base_path(self) -> str:
+        return os.path.dirname(self._name)
 
     @property
     def uuid(self) -> str:
@@ -87,7 +151,7 @@ class FileModel:
         Returns:
             bool: 文件对象是否在分享中
         """
-        return self._is_sharing
+        return self._share.is_sharing
 
     @isSharing.setter
     def isSharing(self, newValue: bool) -> None:
@@ -100,7 +164,7 @@ class FileModel:
         Returns:
             None
         """
-        self._is_sharing = newValue
+        self._share.is_sharing = newValue
 
     @property
     def rowIndex(self) -> Union[None, int]:
@@ -110,7 +174,7 @@ class FileModel:
         Returns:
             Union[None, int]: 在分享列表控件的行号
         """
-        return self._row_index
+        return self._share.row_index
 
     @rowIndex.setter
     def rowIndex(self, newValue: int) -> None:
@@ -123,7 +187,7 @@ class FileModel:
         Returns:
             None
         """
-        self._row_index = newValue
+        self._share.row_index = newValue
 
     @property
     def isDir(self) -> bool:
@@ -143,7 +207,7 @@ class FileModel:
         Returns:
             bool: 文件对象的路径是否存在
         """
-        return os.path.exists(self._target_path)
+        return os.path.exists(self.targetPath)
 
     @property
     def browse_number(self) -> int:
@@ -153,7 +217,7 @@ class FileModel:
         Returns:
             int: 文件对象被浏览次数
         """
-        return self._browse_number
+        return self._share.browse_number
 
     @browse_number.setter
     def browse_number(self, newValue: int) -> None:
@@ -166,7 +230,7 @@ class FileModel:
         Returns:
             None
         """
-        self._browse_number = newValue
+        self._share.browse_number = newValue
 
     @property
     def shareType(self) -> ptype.ShareType:
@@ -176,7 +240,7 @@ class FileModel:
         Returns:
             ptype.ShareType: 文件对象分享的类型
         """
-        return self._share_type
+        return self._share.share_type
 
     @property
     def targetPath(self) -> str:
@@ -186,7 +250,56 @@ class FileModel:
         Returns:
             str: 文件对象的路径
         """
-        return self._target_path
+        names = []
+        fileObj = self
+        while fileObj._parent is not None:
+            names.append(fileObj._name)
+            fileObj = fileObj._parent
+        names.append(fileObj._name)
+        return os.path.join(*reversed(names))
+
+    @property
+    def size(self) -> Union[None, int]:
+        """
+        扫描时取得的文件大小
+
+        Returns:
+            Union[None, int]: 文件大小, 未知或为文件夹时为None
+        """
+        return self._size
+
+    @property
+    def mtime_ns(self) -> int:
+        """
+        扫描时取得的修改时间, 文件夹为最近一次扫描下级时的修改时间
+
+        Returns:
+            int: 修改时间(纳秒), 未知、未扫描或不存在时为-1
+        """
+        return self._mtime_ns
+
+    @property
+    def parent(self) -> Union[None, "DirModel"]:
+        """
+        文件对象的父级文件夹对象
+
+        Returns:
+            Union[None, "DirModel"]: 父级文件夹对象, 分享的根对象为None
+        """
+        return self._parent
+
+    @property
+    def shareRoot(self) -> Union["FileModel", "DirModel"]:
+        """
+        文件对象所在分享的根对象
+
+        Returns:
+            Union["FileModel", "DirModel"]: 分享的根对象
+        """
+        fileObj = self
+        while fileObj._parent is not None:
+            fileObj = fileObj._parent
+        return fileObj
 
     @property
     def ftp_pwd(self) -> Union[None, str]:
@@ -196,17 +309,19 @@ class FileModel:
         Returns:
             Union[None, str]: FTP服务的密码
         """
-        return self._ftp_pwd
+        return self._share.ftp_pwd
 
     @property
     def ftp_port(self) -> Union[None, int]:
         """
-        FTP服务的端口
+        FTP服务的端口, 所有FTP分享共用同一个FTP服务
 
         Returns:
-            Union[None, int]: FTP服务的端口
+            Union[None, int]: FTP服务的端口, 若不是FTP共享则为None
         """
-        return self._ftp_port
+        if self._share.share_type is not ptype.ShareType.ftp:
+            return None
+        return settings.FTP_PORT
 
     @property
     def ftp_basePath(self) -> Union[None, str]:
@@ -216,7 +331,7 @@ class FileModel:
         Returns:
             Union[None, str]: FTP服务的根路径
         """
-        return self._ftp_base_path
+        return self._share.ftp_base_path
 
     @property
     def ftp_cwd(self) -> str:
@@ -226,7 +341,9 @@ class FileModel:
         Returns:
             str: 文件对象对于FTP服务根目录的相对路径
         """
-        result = os.path.dirname(self._target_path.replace(self._ftp_base_path, "", 1))
+        result = os.path.dirname(
+            self.targetPath.replace(self._share.ftp_base_path, "", 1)
+        )
         if settings.IS_WINDOWS:
             result = result.replace("\\", "/")
         return result
@@ -259,23 +376,51 @@ class FileModel:
         Returns:
             str: 文件对象的文件名
         """
-        return os.path.basename(self._target_path)
+        if self._parent is not None:
+            return self._name
+        return os.path.basename(self._name)
 
-    async def to_dict_client(self) -> Dict[str, Union[str, bool]]:
+    async def to_dict_client(
+        self, depth: int = -1, offset: int = 0, limit: Union[None, int] = None
+    ) -> Dict[str, Union[None, str, bool, int]]:
         """
-        给客户端的格式化数据
+        给客户端的格式化数据, 包含文件大小和修改时间, 客户端据此规划下载和跳过本地已完整的文件,
+        下级文件的大小和修改时间在扫描时取得, 由文件夹变化监听更新, 生成列表时无需逐个stat
+
+        Args:
+            depth: 展开的子级层数, 文件对象忽略该参数
+            offset: 子级分页的起始位置, 文件对象忽略该参数
+            limit: 子级分页的个数, 文件对象忽略该参数
 
         Returns:
-            Dict[str, Union[str, bool]]: 给客户端的格式化数据
+            Dict[str, Union[None, str, bool, int]]: 给客户端的格式化数据, 文件不存在时大小和修改时间为None
         """
+        # 分享的根文件不在监听的文件夹内, 每次都重新stat; 大小未知的下级文件补充stat一次
+        if self._parent is None or self._size is None:
+            try:
+                self._set_stat(os.stat(self.targetPath))
+            except OSError:
+                self._set_stat(None)
+
         return {
             "uuid": self._uuid,
             "downloadUrl": self.download_url,
             "fileName": self.file_name,
-            "stareType": self._share_type.value,
+            "stareType": self._share.share_type.value,
             "isDir": self.isDir,
+            "size": self._size,
+            "mtime": None if self._size is None else self._mtime_ns // 1000000000,
         }
 
+    def iter_tree(self) -> Iterator["FileModel"]:
+        """
+        遍历文件对象及其所有下级文件/文件夹对象
+
+        Returns:
+            Iterator["FileModel"]: 文件对象及其所有下级文件/文件夹对象
+        """
+        yield self
+
     async def to_ftp_data(self) -> Dict[str, Union[str, int]]:
         """
         FTP各项数据
@@ -286,9 +431,9 @@ class FileModel:
         return {
             "uuid": self._uuid,
             "host": settings.LOCAL_HOST,
-            "port": self._ftp_port,
-            "user": "a",
-            "passwd": self._ftp_pwd,
+            "port": self.ftp_port,
+            "user": self.shareRoot.uuid,
+            "passwd": self._share.ftp_pwd,
             "cwd": self.ftp_cwd,
             "filename": self.file_name,
         }
@@ -304,14 +449,14 @@ class FileModel:
             "uuid": self._uuid,
             "downloadUrl": self.download_url,
             "fileName": self.file_name,
-            "stareType": self._share_type.value,
+            "stareType": self._share.share_type.value,
             "isDir": self.isDir,
             "browseUrl": self.browse_url,
-            "targetPath": self._target_path,
-            "ftpPwd": self._ftp_pwd,
-            "ftpPort": self._ftp_port,
-            "ftpBasePath": self._ftp_base_path,
-            "browseNumber": self._browse_number,
+            "targetPath": self.targetPath,
+            "ftpPwd": self._share.ftp_pwd,
+            "ftpPort": self.ftp_port,
+            "ftpBasePath": self._share.ftp_base_path,
+            "browseNumber": self._share.browse_number,
         }
 
     def to_dump_backup(self) -> Dict[str, Union[str, bool, int, None]]:
@@ -322,25 +467,40 @@ class FileModel:
             Dict[str, Union[str, bool, int, None]]: 转存的格式化数据
         """
         normal = {
-            "path": self._target_path,
+            "path": self.targetPath,
             "uuid": self._uuid,
             "parent_uuid": None,
-            "share_type": self._share_type.value,
+            "share_type": self._share.share_type.value,
             "isDir": self.isDir,
         }
-        if self._share_type is ptype.ShareType.ftp:
+        if self._share.share_type is ptype.ShareType.ftp:
             normal.update(
                 {
-                    "pwd": self._ftp_pwd,
-                    "port": self._ftp_port,
-                    "ftp_base_path": self._ftp_base_path,
+                    "pwd": self._share.ftp_pwd,
+                    "ftp_base_path": self._share.ftp_base_path,
                 }
             )
 
         return normal
 
+    @staticmethod
+    def load_dump_backup(
+        file_dict: Dict[str, Union[str, bool, int, None]]
+    ) -> Union["FileModel", "DirModel"]:
+        """
+        由转存的格式化数据重建文件/文件夹对象, 仅重建分享根对象, 下级文件/文件夹在访问时再扫描
+
+        Args:
+            file_dict: 转存的格式化数据
+
+        Returns:
+            Union["FileModel", "DirModel"]: 文件/文件夹对象
+        """
+        fileModel = DirModel if file_dict.get("isDir") else FileModel
+        return fileModel(**file_dict)
+
     def __eq__(self, other: str) -> bool:
-        return other.rstrip(os.sep) == self._target_path
+        return other.rstrip(os.sep) == self.targetPath
 
 
 class DirChildrenModel(dict):
@@ -348,6 +508,8 @@ class DirChildrenModel(dict):
 
 
 class DirModel(FileModel):
+    __slots__ = ("_children", "_stats_pending")
+
     def __init__(
         self,
         path: str,
@@ -366,21 +528,35 @@ class DirModel(FileModel):
             uuid: 文件夹uuid
             parent_uuid: 父级文件夹的uuid, 若无父级则为None, 默认为None
             pwd: FTP服务的密码, 若不是FTP共享则为None, 默认为None
-            port: FTP服务的端口, 若不是FTP共享则为None, 默认为None
+            port: 已废弃, 所有FTP分享共用一个FTP服务, 仅为兼容旧的分享记录保留, 默认为None
             ftp_base_path: FTP服务的根路径, 若不是FTP共享则为None, 默认为None
             **kwargs: 其他关键字参数
         """
         super(DirModel, self).__init__(
             path, uuid, parent_uuid, pwd, port, ftp_base_path, **kwargs
         )
-
-        if self._share_type is ptype.ShareType.ftp:
-            self._ftp_base_path = ftp_base_path if ftp_base_path else self._target_path
-        else:
-            self._ftp_base_path = None
-
-        self._children = DirChildrenModel()
-        self._setup_child()
+        # 下级文件/文件夹在首次被访问时才扫描, 扫描结果会被缓存
+        self._children: Union[None, DirChildrenModel] = None
+        # 扫描下级前文件夹的修改时间, 用于校验持久化的分享索引
+        self._mtime_ns = -1
+        # 由分享索引恢复的下级文件还没有大小和修改时间
+        self._stats_pending = False
+
+    @classmethod
+    def _new_child(
+        cls,
+        parent: "DirModel",
+        name: str,
+        stat_result: Union[None, os.stat_result] = None,
+    ) -> "DirModel":
+        child = super(DirModel, cls)._new_child(parent, name, stat_result)
+        child._children = None
+        child._mtime_ns = -1
+        child._stats_pending = False
+        return child
+
+    def _default_ftp_base_path(self) -> str:
+        return self._name
 
     def _setup_child(self) -> None:
         """
@@ -389,20 +565,234 @@ class DirModel(FileModel):
         Returns:
             None
         """
-        for file_name in os.listdir(self._target_path):
-            file_path = os.path.join(self._target_path, file_name)
-            child_uuid = public_func.generate_uuid()
-            fileModel = DirModel if os.path.isdir(file_path) else FileModel
-            child = fileModel(
-                file_path,
-                child_uuid,
-                self._uuid,
-                self._ftp_pwd,
-                self._ftp_port,
-                self._ftp_base_path,
+        mtime_ns, entries = self._scan_entries()
+        children = DirChildrenModel()
+        for entry in entries:
+            child = self._create_child(entry)
+            children[child.uuid] = child
+        self._publish_children(mtime_ns, children)
+
+    def _publish_children(self, mtime_ns: int, children: DirChildrenModel) -> None:
+        with _children_lock:
+            if self._children is not None:
+                return
+            self._children = children
+            self._mtime_ns = mtime_ns
+        if self._share.on_children_loaded is not None:
+            self._share.on_children_loaded(self)
+
+    def _scan_entries(self) -> Tuple[int, List[os.DirEntry]]:
+        # 先取修改时间再扫描, 扫描期间发生的变化会使修改时间对不上, 不会被误认为有效
+        try:
+            mtime_ns = os.stat(self.targetPath).st_mtime_ns
+            entries = public_func.scan_dir(self.targetPath)
+        except OSError:
+            mtime_ns, entries = -1, []
+        # 按名称排序, 保证无论由哪个线程扫描, 子级的顺序都是确定的
+        entries.sort(key=lambda x: x.name)
+        return mtime_ns, entries
+
+    def load_children(
+        self, mtime_ns: int, entries: Iterable[Tuple[str, bool, int, int]]
+    ) -> None:
+        """
+        由已知的下级文件名、大小和修改时间直接初始化下级文件/文件夹, 无需扫描文件夹, 也无需逐个stat,
+        用于从分享索引恢复
+
+        Args:
+            mtime_ns: 下级文件名对应的文件夹修改时间(纳秒)
+            entries: 按名称排序的(文件名, 是否为文件夹, 文件大小, 文件修改时间(纳秒)), 大小未知时为-1
+
+        Returns:
+            None
+        """
+        children = DirChildrenModel()
+        stats_pending = False
+        for name, is_dir, size, file_mtime_ns in entries:
+            fileModel = DirModel if is_dir else FileModel
+            child = fileModel._new_child(self, name)
+            if not is_dir and size >= 0:
+                child._size, child._mtime_ns = size, file_mtime_ns
+            elif not is_dir:
+                stats_pending = True
+            children[child.uuid] = child
+        self._stats_pending = stats_pending
+        self._publish_children(mtime_ns, children)
+
+    def load_child_stats(self) -> None:
+        """
+        补全由分享索引恢复时大小未知的下级文件的大小和修改时间, 每个文件夹仅需一次scandir, 需在线程中调用
+
+        Returns:
+            None
+        """
+        if not self._stats_pending or self._children is None:
+            return
+        stats = {}
+        try:
+            for entry in public_func.scan_dir(self.targetPath):
+                if not entry.is_dir():
+                    stats[entry.name] = self._entry_stat(entry)
+        except OSError:
+            pass
+        for child in self._children.values():
+            if not child.isDir:
+                child._set_stat(stats.get(child.file_name))
+        self._stats_pending = False
+
+    @staticmethod
+    def _entry_stat(entry: os.DirEntry) -> Union[None, os.stat_result]:
+        # Windows下DirEntry自带大小和修改时间, 其他系统需stat一次
+        try:
+            return entry.stat()
+        except OSError:
+            return None
+
+    def _create_child(self, entry: os.DirEntry) -> FileModel:
+        if entry.is_dir():
+            return DirModel._new_child(self, entry.name)
+        return FileModel._new_child(self, entry.name, self._entry_stat(entry))
+
+    def refresh_children(self) -> Tuple[List[FileModel], List[FileModel]]:
+        """
+        重新扫描已扫描过的文件夹, 未变化的子级对象(包括其uuid和已扫描的下级)保持不变
+
+        Returns:
+            Tuple[List[FileModel], List[FileModel]]: 新增的子级对象和被移除的子级对象
+        """
+        if self._children is None:
+            return [], []
+
+        old_children = {x.file_name: x for x in self._children.values()}
+        children = DirChildrenModel()
+        added = []
+        mtime_ns, entries = self._scan_entries()
+        for entry in entries:
+            child = old_children.get(entry.name)
+            if child is not None and child.isDir == entry.is_dir():
+                del old_children[entry.name]
+                # 文件被就地改写时文件对象不变, 需更新其大小和修改时间
+                if not child.isDir:
+                    child._set_stat(self._entry_stat(entry))
+            else:
+                child = self._create_child(entry)
+                added.append(child)
+            children[child.uuid] = child
+
+        with _children_lock:
+            self._children = children
+            self._mtime_ns = mtime_ns
+            self._stats_pending = False
+        return added, list(old_children.values())
+
+    def find_scanned_dir(self, path: str) -> Union[None, "DirModel"]:
+        """
+        按路径查找已扫描过的文件夹对象(包括自身), 不会触发扫描
+
+        Args:
+            path: 文件夹路径
+
+        Returns:
+            Union[None, "DirModel"]: 已扫描过的文件夹对象, 不存在或未扫描时为None
+        """
+        try:
+            relative_path = os.path.relpath(path, self.targetPath)
+        except ValueError:
+            return None
+        if relative_path == os.curdir:
+            return self if self.isScanned else None
+        if (
+            relative_path == os.pardir
+            or relative_path.startswith(os.pardir + os.sep)
+            or os.path.isabs(relative_path)
+        ):
+            return None
+
+        dirObj = self
+        for name in relative_path.split(os.sep):
+            if not dirObj.isScanned:
+                return None
+            dirObj = next(
+                (
+                    x
+                    for x in dirObj._children.values()
+                    if x.isDir and x.file_name == name
+                ),
+                None,
             )
+            if dirObj is None:
+                return None
+
+        return dirObj if dirObj.isScanned else None
+
+    @property
+    def isScanned(self) -> bool:
+        """
+        文件夹是否已扫描过下级文件/文件夹
+
+        Returns:
+            bool: 是否已扫描过
+        """
+        return self._children is not None
+
+    @property
+    def children(self) -> DirChildrenModel:
+        """
+        下级文件/文件夹对象, 首次访问时才扫描文件夹
+
+        Returns:
+            DirChildrenModel: 下级文件/文件夹对象
+        """
+        if self._children is None:
+            self._setup_child()
+        return self._children
+
+    def scan_tree(self, depth: int = -1, max_workers: Union[None, int] = None) -> None:
+        """
+        用线程池并行扫描文件夹及其下级文件夹, 每个文件夹扫描完成后立即提交其下级文件夹的扫描,
+        扫描耗时主要为文件系统的延迟时, 耗时随线程数近似线性下降
+
+        Args:
+            depth: 扫描的层数, 小于0时扫描完整的文件树, 默认为-1
+            max_workers: 扫描的线程数, 默认为配置的线程数
+
+        Returns:
+            None
+        """
 
-            self._children[child_uuid] = child
+        def _scan(dirObj: DirModel, dir_depth: int) -> List[Tuple[DirModel, int]]:
+            children = dirObj.children
+            dirObj.load_child_stats()
+            if dir_depth == 1:
+                return []
+            return [(x, dir_depth - 1) for x in children.values() if x.isDir]
+
+        if depth == 0:
+            return
+        # 仅扫描一层时无需开启线程池
+        if depth == 1:
+            _scan(self, depth)
+            return
+
+        with ThreadPoolExecutor(max_workers or settings.INDEX_WORKERS) as executor:
+            futures = {executor.submit(_scan, self, depth)}
+            while futures:
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for dirObj, dir_depth in future.result():
+                        futures.add(executor.submit(_scan, dirObj, dir_depth))
+
+    def on_children_loaded(self, callback: Callable[["DirModel"], None]) -> None:
+        """
+        设置下级文件/文件夹扫描完成时的回调, 回调保存在分享信息中, 同一分享之后扫描的所有文件夹都会沿用该回调
+
+        Args:
+            callback: 扫描完成时的回调, 参数为完成扫描的文件夹对象
+
+        Returns:
+            None
+        """
+        self._share.on_children_loaded = callback
 
     def get(self, item: str) -> Union[FileModel, "DirModel"]:
         """
@@ -414,7 +804,46 @@ class DirModel(FileModel):
         Returns:
             Union[FileModel, "DirModel"]: 目标文件/文件夹对象
         """
-        return self._children.get(item)
+        return self.children.get(item)
+
+    def iter_tree(self) -> Iterator[FileModel]:
+        """
+        遍历文件夹对象及其已扫描的所有下级文件/文件夹对象, 不会触发扫描
+
+        Returns:
+            Iterator[FileModel]: 文件夹对象及其已扫描的所有下级文件/文件夹对象
+        """
+        yield self
+        if self._children is None:
+            return
+        for child in self._children.values():
+            yield from child.iter_tree()
+
+    def listing_mtimes(self, depth: int = -1) -> Tuple[int, ...]:
+        """
+        获取列表数据所依赖的各文件夹的修改时间, 任一文件夹发生变化即说明列表数据需要重新生成
+
+        Args:
+            depth: 列表数据展开的子级层数, 小于0时为完整的文件树, 默认为-1
+
+        Returns:
+            Tuple[int, ...]: 各文件夹的修改时间(纳秒), 文件夹不存在时为-1
+        """
+        mtimes = []
+        level_dirs = [self]
+        # 仅展开层数内的文件夹返回了子级, 需要校验
+        while level_dirs and depth != 0:
+            next_dirs = []
+            for dirObj in level_dirs:
+                try:
+                    mtimes.append(os.stat(dirObj.targetPath).st_mtime_ns)
+                except OSError:
+                    mtimes.append(-1)
+                next_dirs.extend(x for x in dirObj.children.values() if x.isDir)
+            level_dirs = next_dirs
+            depth -= 1
+
+        return tuple(mtimes)
 
     @property
     def isDir(self) -> bool:
@@ -426,26 +855,56 @@ class DirModel(FileModel):
         """
         return True
 
-    async def to_dict_client(self) -> Dict[str, Any]:
+    async def to_dict_client(
+        self, depth: int = -1, offset: int = 0, limit: Union[None, int] = None
+    ) -> Dict[str, Any]:
         """
-        给客户端的格式化数据
+        给客户端的格式化数据, 返回了完整的文件树时包含文件夹内所有文件的总大小, 客户端据此校验整个文件夹是否已下载完整
+
+        Args:
+            depth: 展开的子级层数, 为0时不返回子级, 小于0时返回完整的文件树, 默认为-1
+            offset: 子级分页的起始位置, 默认为0
+            limit: 子级分页的个数, 为None时不分页, 默认为None
 
         Returns:
-            Dict[str, Any]: 给客户端的格式化数据
+            Dict[str, Any]: 给客户端的格式化数据, 总大小未知时size为None, 未扫描的文件夹total为None
         """
-        children = []
-        for child_uuid, child in self._children.items():
-            child_dict = {child_uuid: await child.to_dict_client()}
-            children.append(child_dict)
-
-        return {
+        result = {
             "uuid": self._uuid,
             "downloadUrl": self.download_url,
             "fileName": self.file_name,
-            "stareType": self._share_type.value,
+            "stareType": self._share.share_type.value,
             "isDir": self.isDir,
-            "children": children,
+            "size": None,
         }
+        # 超出展开层数的文件夹不返回children, 由客户端按需再次请求, 也就无需扫描该文件夹
+        if depth == 0:
+            result["total"] = None if self._children is None else len(self._children)
+            return result
+
+        stop = None if limit is None else offset + limit
+        children = []
+        size = 0
+        for child_uuid, child in islice(self.children.items(), offset, stop):
+            child_data = await child.to_dict_client(depth - 1, 0, limit)
+            children.append({child_uuid: child_data})
+            if size is not None and child_data["size"] is not None:
+                size += child_data["size"]
+            else:
+                size = None
+        # 仅返回了完整的文件树时, 各子级的大小之和才是文件夹的总大小
+        if depth > 0 or offset or len(children) < len(self.children):
+            size = None
+        result.update(
+            {
+                "size": size,
+                "total": len(self.children),
+                "offset": offset,
+                "children": children,
+            }
+        )
+
+        return result
 
     async def to_dict_server(self) -> Dict[str, Any]:
         """
@@ -455,7 +914,7 @@ class DirModel(FileModel):
             Dict[str, Any]: 给服务端的格式化数据
         """
         children = []
-        for child_uuid, child in self._children.items():
+        for child_uuid, child in self.children.items():
             child_dict = {child_uuid: await child.to_dict_server()}
             children.append(child_dict)
 
@@ -463,12 +922,12 @@ class DirModel(FileModel):
             "uuid": self._uuid,
             "downloadUrl": self.download_url,
             "fileName": self.file_name,
-            "stareType": self._share_type.value,
+            "stareType": self._share.share_type.value,
             "isDir": self.isDir,
             "browseUrl": self.browse_url,
-            "targetPath": self._target_path,
-            "ftpPwd": self._ftp_pwd,
-            "ftpPort": self._ftp_port,
-            "ftpBasePath": self._ftp_base_path,
+            "targetPath": self.targetPath,
+            "ftpPwd": self._share.ftp_pwd,
+            "ftpPort": self.ftp_port,
+            "ftpBasePath": self._share.ftp_base_path,
             "children": children,
         }
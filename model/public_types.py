@@ -1,8 +1,12 @@
 __all__ = [
     "FILE_LIST_URI",
     "DOWNLOAD_URI",
+    "ARCHIVE",
     "ShareType",
+    "ArchiveType",
+    "FtpServerMode",
     "DownloadStatus",
+    "ShareCreationStatus",
     "ThemeColor",
     "ControlColorStruct",
     "ColorCardStruct",
@@ -16,6 +20,7 @@ from collections import namedtuple
 FILE_LIST_URI: str = "/file_list"
 DOWNLOAD_URI: str = "/download"
 HIT_LOG: str = "hit_log"
+ARCHIVE: str = "archive"
 
 
 # share type
@@ -28,6 +33,30 @@ class ShareType(str, Enum):
     ftp = "ftp"
 
 
+# archive type
+class ArchiveType(str, Enum):
+    """
+    文件夹打包下载格式枚举类
+    """
+
+    zip = "zip"
+    tar = "tar"
+
+
+# ftp server mode
+class FtpServerMode(str, Enum):
+    """
+    FTP服务并发模式枚举类
+    """
+
+    # 单线程异步, 所有连接共用一个IOLoop
+    single = "single"
+    # 每个连接一个线程
+    thread = "thread"
+    # 每个连接一个进程, 仅支持POSIX系统
+    process = "process"
+
+
 # download status
 class DownloadStatus(int, Enum):
     """
@@ -40,6 +69,18 @@ class DownloadStatus(int, Enum):
     FAILED = 3
 
 
+# share creation status
+class ShareCreationStatus(int, Enum):
+    """
+    创建分享状态枚举类
+    """
+
+    DOING = 0
+    SUCCESS = 1
+    CANCELLED = 2
+    FAILED = 3
+
+
 # verify status
 class VerifyStatus(int, Enum):
     """
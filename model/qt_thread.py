@@ -3,6 +3,7 @@ __all__ = [
     "LoadBrowseUrlThread",
     "DownloadHttpFileThread",
     "DownloadFtpFileThread",
+    "CreateShareThread",
 ]
 
 import time
@@ -10,19 +11,29 @@ import json
 import os
 import asyncio
 import ssl
+import socket
+import tarfile
 from multiprocessing import Queue
 from traceback import format_exc
+from threading import Lock
+from queue import SimpleQueue, Empty
+from concurrent.futures import ThreadPoolExecutor
 from typing import Sequence, Dict, Any, List, Union, Tuple
 
-import requests
 import aiohttp
 from PyQt5.QtCore import QThread, pyqtSignal
 from PyQt5.Qt import QApplication
-from ftplib import FTP
+from ftplib import FTP, error_perm
 
 from settings import settings
+from exceptions import OperationException
 from utils.logger import sysLogger
-from .public_types import DownloadStatus, HIT_LOG
+from utils.tar_stream import TarStreamExtractor
+from utils.http_client import get_http_session, create_async_http_session
+from utils.public_func import remove_hitLog_from_downloadUrl
+from .file import FileModel, DirModel
+from .share_index import dump_share_index
+from .public_types import DownloadStatus, ShareCreationStatus, HIT_LOG, ARCHIVE
 
 
 class WatchResultThread(QThread):
@@ -56,15 +67,17 @@ class WatchResultThread(QThread):
 class LoadBrowseUrlThread(QThread):
     signal = pyqtSignal(dict)
 
-    def __init__(self, browse_url: str):
+    def __init__(self, browse_url: str, depth: int = 1):
         """
         加载分享链接线程类初始化函数
 
         Args:
             browse_url: 分享链接
+            depth: 加载的子级层数, 为-1时加载完整的文件树, 默认为1
         """
         super(LoadBrowseUrlThread, self).__init__()
         self._browse_url = browse_url
+        self._depth = depth
         self.run_flag = True
 
     def run(self) -> None:
@@ -77,18 +90,37 @@ class LoadBrowseUrlThread(QThread):
         sysLogger.debug(f"正在加载分享链接[{self._browse_url}]")
         os.environ["NO_PROXY"] = "127.0.0.1"
         result = {}
-        try:
-            response = requests.get(self._browse_url, timeout=2)
-        except:
-            sysLogger.debug(f"连接服务异常, 正在发射显示分享链接数据事件")
-            self.signal.emit(result)
-            return
+        children = []
+        # 加载完整文件树时对方需先扫描整个分享文件夹, 耗时与文件个数相关, 仅限制连接超时, 不限制读取超时
+        timeout = 2 if self._depth >= 0 else (2, None)
+        # 文件夹的子级是分页返回的, 需逐页加载直至加载完所有子级
+        while self.run_flag:
+            params = {"depth": self._depth, "offset": len(children)}
+            try:
+                response = get_http_session().get(
+                    self._browse_url, params=params, timeout=timeout
+                )
+            except:
+                sysLogger.debug(f"连接服务异常, 正在发射显示分享链接数据事件")
+                self.signal.emit({})
+                return
 
-        try:
-            result = json.loads(response.text)
-        except json.JSONDecodeError:
-            sysLogger.debug(f"服务器返回非法数据[{self._browse_url}]")
-            pass
+            try:
+                page = json.loads(response.text)
+            except json.JSONDecodeError:
+                sysLogger.debug(f"服务器返回非法数据[{self._browse_url}]")
+                result = {}
+                break
+
+            data = page.get("data") if isinstance(page, dict) else None
+            if not isinstance(data, dict) or not isinstance(data.get("children"), list):
+                result = page
+                break
+            children.extend(data["children"])
+            result = page
+            if not data["children"] or len(children) >= data.get("total", 0):
+                data["children"] = children
+                break
 
         if not self.run_flag:
             sysLogger.debug(f"加载分享链接任务停止成功[{self._browse_url}]")
@@ -113,6 +145,8 @@ class DownloadHttpFileThread(QThread):
         self._chunk_size = 1048576
         self.run_flag = True
         self._pause_fileObjs = []
+        self._loop: Union[None, asyncio.AbstractEventLoop] = None
+        self._file_event: Union[None, asyncio.Event] = None
 
     async def _download(
         self, session: aiohttp.ClientSession, fileObj: Dict[str, Any]
@@ -122,16 +156,40 @@ class DownloadHttpFileThread(QThread):
             sysLogger.debug(f"下载暂停完成, 文件路径: {relativePath}")
             return
         url = fileObj["downloadUrl"]
+        if ARCHIVE in url and fileObj.get("isDir"):
+            await self._download_archive(session, fileObj)
+            return
         if HIT_LOG in url and fileObj.get("isDir"):
             sysLogger.debug(f"本次下载动作仅用于让服务器写下载记录, 路径: {relativePath}")
-            await session.get(url)
+            async with session.get(url) as response:
+                if response.status != 200:
+                    sysLogger.warning(
+                        f"让服务器写下载记录失败, 状态码: {response.status}, 路径: {relativePath}"
+                    )
+                    return
             sysLogger.debug(f"让服务器写下载记录完成, 路径: {relativePath}")
             return
         file_path = os.path.abspath(os.path.join(settings.DOWNLOAD_DIR, relativePath))
-        if os.path.exists(file_path):
+        if self._is_complete(file_path, fileObj):
+            sysLogger.debug(f"本地文件与列表中的大小和修改时间一致, 跳过下载, 路径: {relativePath}")
+            self.signal.emit((fileObj, DownloadStatus.SUCCESS, "下载成功"))
+            return
+        if self._should_segment(file_path, fileObj) and await self._download_segments(
+            session, fileObj, file_path
+        ):
+            return
+        etag = self._load_etag(file_path)
+        if os.path.exists(file_path) and etag:
             local_size = os.path.getsize(file_path)
-            headers = {"Range": f"bytes={os.path.getsize(file_path)}-"}
+            # 携带上次下载时保存的ETag, 对方文件已变化时服务端会返回完整文件而非续传区间
+            headers = {"Range": f"bytes={local_size}-", "If-Range": etag}
             mode = "ab"
+        elif os.path.exists(file_path):
+            # 没有保存的ETag时无法确认对方文件未变化, 续传可能拼接出损坏的文件, 需从头下载
+            sysLogger.debug(f"本地文件没有对应的ETag, 需从头下载, 路径: {relativePath}")
+            local_size = 0
+            headers = {}
+            mode = "wb"
         else:
             local_size = 0
             headers = {}
@@ -142,6 +200,28 @@ class DownloadHttpFileThread(QThread):
         try:
             sysLogger.debug(f"开始下载文件, 路径: {relativePath}")
             async with session.get(url, headers=headers) as response:
+                if response.status == 416:
+                    # 请求的区间不可满足, 即本地文件不小于对方文件, 对方文件大小由Content-Range给出
+                    remote_size = response.headers.get("Content-Range", "")
+                    remote_size = remote_size.rsplit("/", 1)[-1]
+                    if remote_size.isdigit() and int(remote_size) == local_size:
+                        self._remove_etag(file_path)
+                        self._sync_mtime(file_path, fileObj)
+                        sysLogger.debug(f"本地文件已完整, 正在发射更新下载状态为成功事件, 路径: {relativePath}")
+                        self.signal.emit((fileObj, DownloadStatus.SUCCESS, "下载成功"))
+                        sysLogger.debug(f"发射更新下载状态为成功事件完成, 路径: {relativePath}")
+                        return
+                    sysLogger.warning(
+                        f"下载文件失败, 失败原因: 本地文件与对方文件不一致, 文件路径: {relativePath}"
+                    )
+                    self.signal.emit((fileObj, DownloadStatus.FAILED, "本地文件与对方文件不一致"))
+                    return
+                if response.status == 200 and local_size:
+                    sysLogger.debug(f"对方未按区间返回文件内容或文件已变化, 需从头下载, 路径: {relativePath}")
+                    local_size = 0
+                    mode = "wb"
+                if response.status in (200, 206) and "ETag" in response.headers:
+                    self._save_etag(file_path, response.headers["ETag"])
                 full_size = local_size + response.content_length
                 if response.content_type == "application/json":
                     data = await response.json()
@@ -162,6 +242,8 @@ class DownloadHttpFileThread(QThread):
                 sysLogger.debug(f"正在写入本地, 路径: {relativePath}")
                 with open(file_path, mode) as f:
                     if full_size == 0:
+                        self._remove_etag(file_path)
+                        self._sync_mtime(file_path, fileObj)
                         sysLogger.debug(f"文件大小为0, 正在发射更新下载状态为成功事件, 路径: {relativePath}")
                         self.signal.emit((fileObj, DownloadStatus.SUCCESS, "下载成功"))
                         sysLogger.debug(f"发射更新下载状态为成功事件完成, 路径: {relativePath}")
@@ -190,6 +272,8 @@ class DownloadHttpFileThread(QThread):
                             )
                         )
                         sysLogger.debug(f"发射更新下载进度事件完成, 路径: {relativePath}")
+            self._remove_etag(file_path)
+            self._sync_mtime(file_path, fileObj)
             sysLogger.debug(f"正在发射更新下载状态为成功事件, 路径: {relativePath}")
             self.signal.emit((fileObj, DownloadStatus.SUCCESS, "下载成功"))
             sysLogger.debug(f"发射更新下载状态为成功事件完成, 路径: {relativePath}")
@@ -210,14 +294,422 @@ class DownloadHttpFileThread(QThread):
             )
             self.signal.emit((fileObj, DownloadStatus.FAILED, "未知错误"))
 
-    async def _main(self, fileList: list) -> None:
-        timeout = aiohttp.ClientTimeout(total=600)
-        connector = aiohttp.TCPConnector(force_close=True)
-        async with aiohttp.ClientSession(
-            connector=connector, timeout=timeout
-        ) as session:
-            tasks = [asyncio.create_task(self._download(session, x)) for x in fileList]
-            await asyncio.wait(tasks)
+    @staticmethod
+    def _is_complete(file_path: str, fileObj: Dict[str, Any]) -> bool:
+        """
+        本地文件是否已完整下载, 下载完成的文件会被设为对方文件的修改时间, 大小和修改时间都一致即视为完整
+
+        Args:
+            file_path: 本地文件路径
+            fileObj: 待下载文件对象
+
+        Returns:
+            bool: 本地文件是否已完整下载, 列表中没有文件大小和修改时间时为False
+        """
+        if fileObj.get("size") is None or fileObj.get("mtime") is None:
+            return False
+        # 分段下载未完成的文件已预先分配了完整大小
+        if os.path.exists(DownloadHttpFileThread._segments_path(file_path)):
+            return False
+        try:
+            stat_result = os.stat(file_path)
+        except OSError:
+            return False
+
+        return (
+            stat_result.st_size == fileObj["size"]
+            and int(stat_result.st_mtime) == fileObj["mtime"]
+        )
+
+    @staticmethod
+    def _sync_mtime(file_path: str, fileObj: Dict[str, Any]) -> None:
+        """
+        将下载完成的本地文件的修改时间设为对方文件的修改时间
+
+        Args:
+            file_path: 本地文件路径
+            fileObj: 已下载的文件对象
+
+        Returns:
+            None
+        """
+        mtime = fileObj.get("mtime")
+        if mtime is None:
+            return
+        try:
+            os.utime(file_path, (mtime, mtime))
+        except OSError:
+            sysLogger.warning(f"设置本地文件修改时间失败, 文件路径: {file_path}")
+
+    @staticmethod
+    def _etag_path(file_path: str) -> str:
+        return f"{file_path}.etag"
+
+    @staticmethod
+    def _load_etag(file_path: str) -> Union[None, str]:
+        """
+        读取未下载完成的文件对应的ETag, ETag保存在同目录下的.etag文件中, 软件重启后续传时仍可校验对方文件是否变化
+
+        Args:
+            file_path: 本地文件路径
+
+        Returns:
+            Union[None, str]: 上次下载时对方返回的ETag, 没有保存时为None
+        """
+        try:
+            with open(
+                DownloadHttpFileThread._etag_path(file_path), "r", encoding="utf-8"
+            ) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    @staticmethod
+    def _save_etag(file_path: str, etag: str) -> None:
+        base_path = os.path.dirname(file_path)
+        try:
+            if not os.path.isdir(base_path):
+                os.makedirs(base_path)
+            with open(
+                DownloadHttpFileThread._etag_path(file_path), "w", encoding="utf-8"
+            ) as f:
+                f.write(etag)
+        except OSError:
+            sysLogger.warning(f"保存文件的ETag失败, 文件路径: {file_path}")
+
+    @staticmethod
+    def _remove_etag(file_path: str) -> None:
+        try:
+            os.remove(DownloadHttpFileThread._etag_path(file_path))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _segments_path(file_path: str) -> str:
+        return f"{file_path}.segments"
+
+    def _should_segment(self, file_path: str, fileObj: Dict[str, Any]) -> bool:
+        """
+        是否分段并行下载文件, 列表中的文件大小不小于HTTP_SEGMENT_MIN_SIZE时分段,
+        本地已有单连接下载的部分文件时继续单连接续传
+
+        Args:
+            file_path: 本地文件路径
+            fileObj: 待下载文件对象
+
+        Returns:
+            bool: 是否分段下载
+        """
+        full_size = fileObj.get("size")
+        if settings.HTTP_DOWNLOAD_SEGMENTS <= 1 or full_size is None:
+            return False
+        if full_size < settings.HTTP_SEGMENT_MIN_SIZE:
+            return False
+
+        return os.path.exists(self._segments_path(file_path)) or not os.path.exists(
+            file_path
+        )
+
+    @staticmethod
+    def _load_segments(
+        segments_path: str, full_size: int
+    ) -> Union[None, Dict[str, Any]]:
+        try:
+            with open(segments_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(state, dict) or state.get("size") != full_size:
+            return None
+        segments = state.get("segments")
+        if not isinstance(segments, list) or not all(
+            isinstance(x, list) and len(x) == 3 and all(isinstance(y, int) for y in x)
+            for x in segments
+        ):
+            return None
+
+        return state
+
+    @staticmethod
+    def _save_segments(segments_path: str, state: Dict[str, Any]) -> None:
+        try:
+            with open(segments_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+        except OSError:
+            sysLogger.warning(f"保存分段下载进度失败, 文件路径: {segments_path}")
+
+    @staticmethod
+    def _segment_headers(segment: List[int], etag: Union[None, str]) -> Dict[str, str]:
+        headers = {"Range": f"bytes={segment[2]}-{segment[1]}"}
+        # 对方文件已变化时服务端会返回完整文件, 据此发现变化
+        if etag:
+            headers["If-Range"] = etag
+        return headers
+
+    async def _download_segments(
+        self, session: aiohttp.ClientSession, fileObj: Dict[str, Any], file_path: str
+    ) -> bool:
+        """
+        分段并行下载文件, 将文件按区间分为HTTP_DOWNLOAD_SEGMENTS段, 各段使用单独的连接写入预先分配大小的本地文件,
+        各段的下载进度保存在同目录下的.segments文件中, 暂停或失败后可继续下载未完成的部分
+
+        Args:
+            session: HTTP会话
+            fileObj: 待下载文件对象
+            file_path: 本地文件路径
+
+        Returns:
+            bool: 是否已处理, 对方不支持按区间返回或文件已变化时为False, 需退回单连接下载
+        """
+        relativePath = fileObj["relativePath"]
+        url = fileObj["downloadUrl"]
+        full_size = fileObj["size"]
+        segments_path = self._segments_path(file_path)
+        state = self._load_segments(segments_path, full_size)
+        if state is None:
+            step = -(-full_size // settings.HTTP_DOWNLOAD_SEGMENTS)
+            state = {
+                "size": full_size,
+                "etag": None,
+                # 各分段为[起始位置, 结束位置, 下一个待写入位置]
+                "segments": [
+                    [start, min(start + step, full_size) - 1, start]
+                    for start in range(0, full_size, step)
+                ],
+            }
+        pending = [x for x in state["segments"] if x[2] <= x[1]]
+        job = {
+            "file": None,
+            "path": segments_path,
+            "state": state,
+            "done": sum(x[2] - x[0] for x in state["segments"]),
+            "paused": False,
+        }
+        try:
+            if pending:
+                # 先请求第一个未完成的分段, 由响应判断对方是否支持按区间返回
+                sysLogger.debug(f"开始分段下载文件, 分段数: {len(pending)}, 路径: {relativePath}")
+                response = await session.get(
+                    url, headers=self._segment_headers(pending[0], state["etag"])
+                )
+                content_range = response.headers.get("Content-Range", "")
+                if response.status != 206 or content_range.rsplit("/", 1)[-1] != str(
+                    full_size
+                ):
+                    response.release()
+                    sysLogger.debug(f"对方未按区间返回文件内容或文件已变化, 退回单连接下载, 路径: {relativePath}")
+                    # 丢弃上次已预先分配的文件, 单连接从头下载
+                    if os.path.exists(segments_path):
+                        os.remove(segments_path)
+                        if os.path.exists(file_path):
+                            os.remove(file_path)
+                    return False
+                state["etag"] = response.headers.get("ETag", state["etag"])
+
+                base_path = os.path.dirname(file_path)
+                if not os.path.isdir(base_path):
+                    os.makedirs(base_path)
+                mode = "r+b" if os.path.exists(file_path) else "wb"
+                with open(file_path, mode) as f:
+                    # 预先分配完整大小, 各分段直接写入各自的位置
+                    f.truncate(full_size)
+                    job["file"] = f
+                    self._save_segments(segments_path, state)
+                    self.signal.emit(
+                        (fileObj, DownloadStatus.DOING, job["done"] * 100 / full_size)
+                    )
+                    # 第一个分段直接使用已获得的响应
+                    tasks = [
+                        asyncio.create_task(
+                            self._download_segment(
+                                session, fileObj, job, x, None if i else response
+                            )
+                        )
+                        for i, x in enumerate(pending)
+                    ]
+                    try:
+                        await asyncio.gather(*tasks)
+                    finally:
+                        for task in tasks:
+                            task.cancel()
+                        await asyncio.gather(*tasks, return_exceptions=True)
+                        f.flush()
+                        self._save_segments(segments_path, state)
+
+            if job["paused"]:
+                sysLogger.debug(f"下载暂停完成, 正在发射更新下载状态为暂停事件, 路径: {relativePath}")
+                self.signal.emit((fileObj, DownloadStatus.PAUSE, "暂停成功"))
+                return True
+            os.remove(segments_path)
+            self._sync_mtime(file_path, fileObj)
+            sysLogger.debug(f"正在发射更新下载状态为成功事件, 路径: {relativePath}")
+            self.signal.emit((fileObj, DownloadStatus.SUCCESS, "下载成功"))
+            sysLogger.debug(f"发射更新下载状态为成功事件完成, 路径: {relativePath}")
+        except aiohttp.ClientConnectorError:
+            sysLogger.warning(f"分段下载文件失败, 失败原因: 连接目标网络失败, 文件路径: {relativePath}")
+            self.signal.emit((fileObj, DownloadStatus.FAILED, "连接目标网络失败"))
+        except (aiohttp.ClientPayloadError, aiohttp.ServerDisconnectedError):
+            sysLogger.warning(f"分段下载文件失败, 失败原因: 与目标失去连接, 文件路径: {relativePath}")
+            self.signal.emit((fileObj, DownloadStatus.FAILED, "与目标失去连接"))
+        except OperationException as e:
+            sysLogger.warning(f"分段下载文件失败, 失败原因: {e}, 文件路径: {relativePath}")
+            self.signal.emit((fileObj, DownloadStatus.FAILED, str(e)))
+        except Exception:
+            sysLogger.error(
+                f"分段下载文件失败, 文件路径: {relativePath}, 失败原因: 未知错误, 错误原始明细如下:\n{format_exc()}"
+            )
+            self.signal.emit((fileObj, DownloadStatus.FAILED, "未知错误"))
+
+        return True
+
+    async def _download_segment(
+        self,
+        session: aiohttp.ClientSession,
+        fileObj: Dict[str, Any],
+        job: Dict[str, Any],
+        segment: List[int],
+        response: Union[None, aiohttp.ClientResponse] = None,
+    ) -> None:
+        state = job["state"]
+        if response is None:
+            # 下载记录已由第一个分段的请求写入, 其余分段不再携带HIT_LOG标志
+            response = await session.get(
+                remove_hitLog_from_downloadUrl(fileObj["downloadUrl"]),
+                headers=self._segment_headers(segment, state["etag"]),
+            )
+        async with response:
+            if response.status != 206:
+                raise OperationException("对方文件已变化, 请重新下载")
+            f = job["file"]
+            async for chunk in response.content.iter_chunked(self._chunk_size):
+                if job["paused"] or self._is_pause(fileObj):
+                    job["paused"] = True
+                    return
+                # 同一线程内的协程之间不会在seek与write之间切换, 无需加锁
+                chunk = chunk[: segment[1] + 1 - segment[2]]
+                f.seek(segment[2])
+                f.write(chunk)
+                segment[2] += len(chunk)
+                job["done"] += len(chunk)
+                self.signal.emit(
+                    (fileObj, DownloadStatus.DOING, job["done"] * 100 / state["size"])
+                )
+                if segment[2] > segment[1]:
+                    break
+        if segment[2] <= segment[1]:
+            raise OperationException("分段数据不完整")
+        f.flush()
+        self._save_segments(job["path"], state)
+
+    async def _download_archive(
+        self, session: aiohttp.ClientSession, fileObj: Dict[str, Any]
+    ) -> None:
+        relativePath = fileObj["relativePath"]
+        extractor = TarStreamExtractor(settings.DOWNLOAD_DIR)
+        try:
+            sysLogger.debug(f"开始打包下载文件夹, 路径: {relativePath}")
+            async with session.get(fileObj["downloadUrl"]) as response:
+                if response.content_type == "application/json":
+                    data = await response.json()
+                    if data.get("errno", 200) == 404:
+                        sysLogger.warning(f"文件夹分享后被删除, 文件夹路径: {relativePath}")
+                        self.signal.emit((fileObj, DownloadStatus.FAILED, "文件夹分享后被删除"))
+                    else:
+                        sysLogger.warning(
+                            f"对方系统异常, 服务端返回的信息: {data.get('errmsg', '未知异常')}"
+                        )
+                        self.signal.emit((fileObj, DownloadStatus.FAILED, "对方系统异常"))
+                    return
+                elif response.content_type != "application/x-tar":
+                    sysLogger.warning(f"打包下载文件夹失败, 失败原因: 对方系统异常, 文件夹路径: {relativePath}")
+                    self.signal.emit((fileObj, DownloadStatus.FAILED, "对方系统异常"))
+                    return
+                full_size = response.content_length or 0
+                local_size = 0
+                sysLogger.debug(f"正在边下载边解包至本地, 路径: {relativePath}")
+                async for chunk in response.content.iter_chunked(self._chunk_size):
+                    if self._is_pause(fileObj):
+                        sysLogger.debug(f"下载暂停完成, 正在发射更新下载状态为暂停事件, 路径: {relativePath}")
+                        self.signal.emit((fileObj, DownloadStatus.PAUSE, "暂停成功"))
+                        return
+                    extractor.feed(chunk)
+                    local_size += len(chunk)
+                    if full_size:
+                        self.signal.emit(
+                            (
+                                fileObj,
+                                DownloadStatus.DOING,
+                                local_size * 100 / full_size,
+                            )
+                        )
+                if not extractor.finished:
+                    sysLogger.warning(
+                        f"打包下载文件夹失败, 失败原因: 压缩包数据不完整, 文件夹路径: {relativePath}"
+                    )
+                    self.signal.emit((fileObj, DownloadStatus.FAILED, "压缩包数据不完整"))
+                    return
+            sysLogger.debug(f"正在发射更新下载状态为成功事件, 路径: {relativePath}")
+            self.signal.emit((fileObj, DownloadStatus.SUCCESS, "下载成功"))
+            sysLogger.debug(f"发射更新下载状态为成功事件完成, 路径: {relativePath}")
+        except aiohttp.ClientConnectorError:
+            sysLogger.warning(f"打包下载文件夹失败, 失败原因: 连接目标网络失败, 文件夹路径: {relativePath}")
+            self.signal.emit((fileObj, DownloadStatus.FAILED, "连接目标网络失败"))
+        except (aiohttp.ClientPayloadError, aiohttp.ServerDisconnectedError):
+            sysLogger.warning(f"打包下载文件夹失败, 失败原因: 与目标失去连接, 文件夹路径: {relativePath}")
+            self.signal.emit((fileObj, DownloadStatus.FAILED, "与目标失去连接"))
+        except (tarfile.TarError, OperationException) as e:
+            sysLogger.warning(f"打包下载文件夹失败, 失败原因: 压缩包数据异常({e}), 文件夹路径: {relativePath}")
+            self.signal.emit((fileObj, DownloadStatus.FAILED, "压缩包数据异常"))
+        except Exception:
+            sysLogger.error(
+                f"打包下载文件夹失败, 文件夹路径: {relativePath}, 失败原因: 未知错误, 错误原始明细如下:\n{format_exc()}"
+            )
+            self.signal.emit((fileObj, DownloadStatus.FAILED, "未知错误"))
+        finally:
+            extractor.close()
+
+    async def _download_in_slot(
+        self,
+        session: aiohttp.ClientSession,
+        fileObj: Dict[str, Any],
+        semaphore: asyncio.Semaphore,
+    ) -> None:
+        try:
+            await self._download(session, fileObj)
+        finally:
+            semaphore.release()
+
+    async def _main(self) -> None:
+        """
+        持续运行的下载调度, 由信号量限制同时下载的文件个数, 任一文件下载结束即从下载列表中取出下一个开始下载,
+        无需等待同时下载的其他文件
+
+        Returns:
+            None
+        """
+        self._file_event = asyncio.Event()
+        semaphore = asyncio.Semaphore(settings.HTTP_DOWNLOAD_CONCURRENCY)
+        tasks = set()
+        # 同一会话在线程运行期间一直使用, 各文件的下载复用已建立的连接
+        async with create_async_http_session() as session:
+            while self.run_flag:
+                await semaphore.acquire()
+                self._file_event.clear()
+                fileObj = self._pop_file()
+                if fileObj is None:
+                    semaphore.release()
+                    try:
+                        await asyncio.wait_for(self._file_event.wait(), 3)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                task = asyncio.create_task(
+                    self._download_in_slot(session, fileObj, semaphore)
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
 
     def run(self) -> None:
         """
@@ -230,29 +722,19 @@ class DownloadHttpFileThread(QThread):
         os.environ["NO_PROXY"] = "127.0.0.1"
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-        while self.run_flag:
-            if self._file_list:
-                downloading_list = self._append_up_to_five_files()
-                loop.run_until_complete(self._main(downloading_list))
-                QApplication.processEvents()
-            else:
-                time.sleep(3)
-
+        self._loop = loop
+        loop.run_until_complete(self._main())
+        self._loop = None
         loop.close()
 
-    def _append_up_to_five_files(self) -> List[Dict[str, Any]]:
-        sysLogger.debug("追加最多5个文件到下载列表")
-        downloading_list = []
+    def _pop_file(self) -> Union[None, Dict[str, Any]]:
         while self._file_list:
             fileObj = self._file_list.pop(0)
             if fileObj not in self._pause_fileObjs:
-                downloading_list.append(fileObj)
-                if len(downloading_list) >= 5:
-                    break
-            else:
-                self._pause_fileObjs.remove(fileObj)
+                return fileObj
+            self._pause_fileObjs.remove(fileObj)
 
-        return downloading_list
+        return None
 
     def append(self, fileList: Sequence[Dict[str, Any]]) -> None:
         """
@@ -266,6 +748,10 @@ class DownloadHttpFileThread(QThread):
         """
         sysLogger.debug("追加下载列表")
         self._file_list.extend(fileList)
+        # 唤醒等待中的下载调度, 立即开始下载追加的文件
+        loop = self._loop
+        if loop is not None and self._file_event is not None:
+            loop.call_soon_threadsafe(self._file_event.set)
 
     def pause(self, fileObj: Dict[str, Any]) -> None:
         """
@@ -304,7 +790,9 @@ class DownloadFtpFileThread(QThread):
         self._file_list = [fileList]
         self.run_flag = True
         self._chunk_size = 1048576
+        self._abort_timeout = 5
         self._pause_fileObjs = []
+        self._list_lock = Lock()
 
     def run(self) -> None:
         """
@@ -334,10 +822,7 @@ class DownloadFtpFileThread(QThread):
                         self.signal.emit((fileDict, DownloadStatus.FAILED, ftp_client))
                     continue
 
-                for fileDict in download_list:
-                    self._download_file(ftp_param["cwd"], ftp_client, fileDict)
-                    QApplication.processEvents()
-                ftp_client.close()
+                self._download_files(ftp_param, ftp_client, download_list)
             else:
                 time.sleep(3)
 
@@ -369,15 +854,185 @@ class DownloadFtpFileThread(QThread):
             ftp.encoding = "utf-8"
             return (True, ftp)
 
-    def _download_file(
-        self, cwd: str, ftp_client: FTP, fileDict: Dict[str, Any]
+    def _download_files(
+        self,
+        ftp_param: Dict[str, Union[str, int]],
+        ftp_client: FTP,
+        download_list: List[Dict[str, Any]],
     ) -> None:
+        """
+        由多个FTP连接从同一下载队列中并行下载文件, 队列中的文件按所在目录排列,
+        各连接仅在所在目录变化时切换工作目录, 每个目录只列出一次文件大小
+
+        Args:
+            ftp_param: FTP连接参数
+            ftp_client: 已登录的FTP连接
+            download_list: 待下载文件对象列表
+
+        Returns:
+            None
+        """
+        dir_fileDicts: Dict[str, List[Dict[str, Any]]] = {}
+        for fileDict in download_list:
+            file_cwd = self._calc_cwd(ftp_param["cwd"], fileDict["relativePath"])
+            dir_fileDicts.setdefault(file_cwd, []).append(fileDict)
+
+        work_queue = SimpleQueue()
+        for file_cwd, fileDicts in dir_fileDicts.items():
+            for fileDict in fileDicts:
+                work_queue.put((file_cwd, fileDict))
+
+        ftp_clients = [ftp_client]
+        for _ in range(min(settings.FTP_DOWNLOAD_CONNECTIONS, len(download_list)) - 1):
+            ftp_status, client = self._generate_ftp_client(ftp_param)
+            if not ftp_status:
+                sysLogger.warning(
+                    f"创建FTP连接失败, 使用已创建的{len(ftp_clients)}个连接下载, 失败原因: {client}"
+                )
+                break
+            ftp_clients.append(client)
+
+        sysLogger.debug(f"使用{len(ftp_clients)}个FTP连接下载{len(download_list)}个文件")
+        # 各目录的文件大小, 目录不存在时为None, 由各连接共享
+        dir_file_sizes: Dict[str, Union[None, Dict[str, int]]] = {}
+        with ThreadPoolExecutor(len(ftp_clients)) as executor:
+            for client in ftp_clients:
+                executor.submit(
+                    self._download_worker, client, work_queue, dir_file_sizes
+                )
+
+        # 所有连接都异常断开时, 队列中剩余的文件无法再下载
+        while self.run_flag:
+            try:
+                _, fileDict = work_queue.get_nowait()
+            except Empty:
+                break
+            sysLogger.warning(
+                f"文件下载失败, 失败原因: FTP连接异常断开, 文件路径: {fileDict['relativePath']}"
+            )
+            self.signal.emit((fileDict, DownloadStatus.FAILED, "FTP连接异常断开"))
+
+    def _download_worker(
+        self,
+        ftp_client: FTP,
+        work_queue: SimpleQueue,
+        dir_file_sizes: Dict[str, Union[None, Dict[str, int]]],
+    ) -> None:
+        """
+        单个FTP连接的下载循环, 从下载队列中依次取出文件下载, 队列为空或连接异常时结束并关闭连接
+
+        Args:
+            ftp_client: 已登录的FTP连接
+            work_queue: 下载队列, 元素为文件所在目录及文件对象
+            dir_file_sizes: 各目录的文件大小
+
+        Returns:
+            None
+        """
+        current_cwd = None
+        fileDict = None
+        try:
+            while self.run_flag:
+                try:
+                    file_cwd, fileDict = work_queue.get_nowait()
+                except Empty:
+                    break
+                if file_cwd != current_cwd:
+                    current_cwd = None
+                    if file_cwd in dir_file_sizes and dir_file_sizes[file_cwd] is None:
+                        self._emit_dir_missing(fileDict)
+                        continue
+                    try:
+                        ftp_client.cwd(file_cwd)
+                    except error_perm:
+                        dir_file_sizes[file_cwd] = None
+                        self._emit_dir_missing(fileDict)
+                        continue
+                    # 多个连接同时进入同一目录时, 只由其中一个列出文件大小
+                    with self._list_lock:
+                        if dir_file_sizes.get(file_cwd) is None:
+                            dir_file_sizes[file_cwd] = self._list_file_sizes(ftp_client)
+                    # 列出目录时ftplib会切换为ASCII模式, 断点续传需切换回二进制模式
+                    ftp_client.sendcmd("TYPE I")
+                    current_cwd = file_cwd
+                reusable = self._download_file(
+                    ftp_client,
+                    fileDict,
+                    dir_file_sizes[file_cwd].get(fileDict["fileName"]),
+                )
+                fileDict = None
+                # 中止传输失败的连接应答已错乱, 剩余文件交由其他连接下载
+                if not reusable:
+                    break
+        except Exception:
+            sysLogger.error(f"FTP连接下载异常, 错误原始明细如下:\n{format_exc()}")
+            if fileDict is not None:
+                self.signal.emit((fileDict, DownloadStatus.FAILED, "文件已找到,但下载中出现异常"))
+        finally:
+            ftp_client.close()
+
+    def _emit_dir_missing(self, fileDict: Dict[str, Any]) -> None:
+        sysLogger.warning(f"文件下载失败, 失败原因: 文件所在目录已不存在, 文件路径: {fileDict['relativePath']}")
+        self.signal.emit((fileDict, DownloadStatus.FAILED, "文件所在目录已不存在"))
+
+    def _list_file_sizes(self, ftp_client: FTP) -> Dict[str, int]:
+        """
+        列出当前工作目录下各文件的大小, 优先使用MLSD, 服务端不支持时退回到LIST
+
+        Args:
+            ftp_client: 已登录的FTP连接
+
+        Returns:
+            Dict[str, int]: 文件名及其大小, 无法解析的文件不在其中
+        """
+        file_sizes = {}
+        try:
+            for name, facts in ftp_client.mlsd(facts=["type", "size"]):
+                if facts.get("type") == "file" and facts.get("size", "").isdigit():
+                    file_sizes[name] = int(facts["size"])
+            return file_sizes
+        except error_perm:
+            sysLogger.debug("FTP服务不支持MLSD, 退回到LIST")
+
+        lines = []
+        try:
+            ftp_client.retrlines("LIST", lines.append)
+        except error_perm:
+            return file_sizes
+        # Unix风格的LIST格式: 权限 链接数 所有者 所属组 大小 月 日 时间/年 文件名
+        for line in lines:
+            parts = line.split(None, 8)
+            if len(parts) == 9 and line.startswith("-") and parts[4].isdigit():
+                file_sizes[parts[8]] = int(parts[4])
+
+        return file_sizes
+
+    def _download_file(
+        self, ftp_client: FTP, fileDict: Dict[str, Any], full_size: Union[None, int]
+    ) -> bool:
+        """
+        使用指定FTP连接下载单个文件
+
+        Args:
+            ftp_client: 已登录的FTP连接
+            fileDict: 待下载文件对象
+            full_size: 文件大小, 未知时为None
+
+        Returns:
+            bool: 该连接是否仍可继续用于下载
+        """
         relativePath = fileDict["relativePath"]
         if self._is_pause(fileDict):
             sysLogger.debug(f"下载暂停完成, 文件路径: {relativePath}")
-            return
+            return True
         fileName = fileDict["fileName"]
-        cwd = self._calc_cwd(cwd, relativePath)
+        if full_size is None:
+            try:
+                full_size = ftp_client.size(fileName)
+            except error_perm:
+                sysLogger.warning(f"文件下载失败, 失败原因: 文件分享后被删除, 文件路径: {relativePath}")
+                self.signal.emit((fileDict, DownloadStatus.FAILED, "文件分享后被删除"))
+                return True
         local_path = os.path.join(settings.DOWNLOAD_DIR, relativePath)
         if os.path.exists(local_path):
             local_size = os.path.getsize(local_path)
@@ -388,43 +1043,47 @@ class DownloadFtpFileThread(QThread):
             base_path = os.path.dirname(local_path)
             if not os.path.isdir(base_path):
                 os.makedirs(base_path)
+        # 本地文件已完整时无需再发起传输, 只下载缺少的部分
+        if local_size > full_size:
+            sysLogger.warning(f"文件下载失败, 失败原因: 本地文件与对方文件不一致, 文件路径: {relativePath}")
+            self.signal.emit((fileDict, DownloadStatus.FAILED, "本地文件与对方文件不一致"))
+            return True
+        if local_size == full_size and local_size:
+            sysLogger.debug(f"本地文件已完整, 正在发射更新下载状态为成功事件, 路径: {relativePath}")
+            self.signal.emit((fileDict, DownloadStatus.SUCCESS, "下载成功"))
+            return True
 
         with open(local_path, mode) as r_f:
-            ftp_client.sendcmd("TYPE I")
-            try:
-                ftp_client.cwd(cwd)
-            except:
-                sysLogger.warning(f"文件下载失败, 失败原因: 文件所在目录已不存在, 文件路径: {relativePath}")
-                self.signal.emit((fileDict, DownloadStatus.FAILED, "文件所在目录已不存在"))
-                return
-            full_size = ftp_client.size(fileName)
             if full_size == 0:
                 sysLogger.debug(f"文件大小为0, 正在发射更新下载状态为成功事件, 路径: {relativePath}")
                 self.signal.emit((fileDict, DownloadStatus.SUCCESS, "下载成功"))
                 sysLogger.debug(f"发射更新下载状态为成功事件完成, 路径: {relativePath}")
-                return
+                return True
             sysLogger.debug(f"正在发射更新下载进度事件, 路径: {relativePath}")
             self.signal.emit(
                 (fileDict, DownloadStatus.DOING, local_size * 100 / full_size)
             )
             sysLogger.debug(f"发射更新下载进度事件完成, 路径: {relativePath}")
-            ftp_client.sendcmd(f"REST {local_size}")
-            with ftp_client.transfercmd(f"RETR {fileName}", None) as conn:
+            # 只有本地已下载部分时才需要REST续传
+            with ftp_client.transfercmd(f"RETR {fileName}", local_size or None) as conn:
                 while True:
                     if self._is_pause(fileDict):
+                        reusable = self._abort_transfer(ftp_client, conn)
                         sysLogger.debug(f"下载暂停完成, 正在发射更新下载状态为暂停事件, 路径: {relativePath}")
                         self.signal.emit((fileDict, DownloadStatus.PAUSE, "暂停成功"))
                         sysLogger.debug(f"发射更新下载状态为暂停事件完成, 路径: {relativePath}")
-                        return
+                        return reusable
                     try:
                         data = conn.recv(self._chunk_size)
                     except Exception:
+                        reusable = self._abort_transfer(ftp_client, conn)
                         sysLogger.warning(
                             f"文件下载失败, 失败原因: 文件已找到,但下载中出现异常, 文件路径: {relativePath}"
                         )
                         self.signal.emit(
                             (fileDict, DownloadStatus.FAILED, "文件已找到,但下载中出现异常")
                         )
+                        return reusable
                     if not data:
                         break
                     r_f.write(data)
@@ -441,13 +1100,38 @@ class DownloadFtpFileThread(QThread):
             sysLogger.debug(f"正在发射更新下载状态为成功事件, 路径: {relativePath}")
             self.signal.emit((fileDict, DownloadStatus.SUCCESS, "下载成功"))
             sysLogger.debug(f"发射更新下载状态为成功事件完成, 路径: {relativePath}")
+        return True
+
+    def _abort_transfer(self, ftp_client: FTP, conn: socket.socket) -> bool:
+        """
+        中止正在进行的传输并读取服务端的全部应答, 使控制连接上的应答与后续命令保持对应
+
+        Args:
+            ftp_client: 正在传输的FTP连接
+            conn: 传输使用的数据连接
+
+        Returns:
+            bool: 是否成功中止, 失败时该连接不可再复用
+        """
+        conn.close()
+        ftp_client.sock.settimeout(self._abort_timeout)
+        try:
+            resp = ftp_client.abort()
+            # 426表示传输被中止, 226表示传输在中止前已完成, 两种情况下服务端随后还会应答ABOR
+            if resp[:3] in ("426", "226"):
+                ftp_client.voidresp()
+            ftp_client.sock.settimeout(None)
+        except Exception:
+            sysLogger.warning(f"中止FTP传输失败, 该连接不再复用, 错误原始明细如下:\n{format_exc()}")
+            return False
+        return True
 
     def _get_ftp_param(self, fileDict: Dict[str, Any]) -> Dict[str, Union[str, int]]:
         sysLogger.debug("获取FTP必要参数")
         os.environ["NO_PROXY"] = "127.0.0.1"
         headers = {"X-Client": "file-sharer client"}
         try:
-            response = requests.get(
+            response = get_http_session().get(
                 fileDict.get("downloadUrl"), headers=headers, timeout=2
             )
         except:
@@ -522,3 +1206,66 @@ class DownloadFtpFileThread(QThread):
             self._pause_fileObjs.remove(fileObj)
             return True
         return False
+
+
+class CreateShareThread(QThread):
+    signal = pyqtSignal(tuple)
+
+    def __init__(self, fileObj: DirModel):
+        """
+        创建分享线程类初始化函数, 在后台并行扫描分享的文件夹、统计文件个数并写入分享索引,
+        服务进程添加分享时由索引恢复文件树, 无需再次扫描
+
+        Args:
+            fileObj: 待分享的文件夹对象
+        """
+        super(CreateShareThread, self).__init__()
+        self.fileObj = fileObj
+        self.run_flag = True
+        self._file_count = 0
+        self._count_lock = Lock()
+        self._emit_time = 0.0
+        # 两次进度事件的最小间隔(秒), 避免大量小文件夹时频繁刷新界面
+        self._emit_interval = 0.2
+
+    def _on_children_loaded(self, dirObj: DirModel) -> None:
+        if not self.run_flag:
+            raise OperationException("创建分享已被取消")
+
+        file_count = sum(1 for x in dirObj.children.values() if not x.isDir)
+        with self._count_lock:
+            self._file_count += file_count
+            now = time.monotonic()
+            if now - self._emit_time < self._emit_interval:
+                return
+            self._emit_time = now
+        self.signal.emit((self.fileObj, ShareCreationStatus.DOING, self._file_count))
+
+    def run(self) -> None:
+        """
+        线程运行入口函数
+
+        Returns:
+            None
+        """
+        targetPath = self.fileObj.targetPath
+        sysLogger.debug(f"开始扫描分享的文件夹, 路径: {targetPath}")
+        # 扫描用的文件树仅用于统计和写入索引, 写入后即释放, 主界面只保留分享的根对象
+        scanObj = FileModel.load_dump_backup(self.fileObj.to_dump_backup())
+        scanObj.on_children_loaded(self._on_children_loaded)
+        try:
+            scanObj.scan_tree(-1)
+            dump_share_index(scanObj)
+        except OperationException:
+            sysLogger.info(f"创建分享已被取消, 路径: {targetPath}")
+            self.signal.emit(
+                (self.fileObj, ShareCreationStatus.CANCELLED, self._file_count)
+            )
+            return
+        except Exception as e:
+            sysLogger.error(f"扫描分享的文件夹失败, 路径: {targetPath}, 错误原始明细如下:\n{format_exc()}")
+            self.signal.emit((self.fileObj, ShareCreationStatus.FAILED, str(e)))
+            return
+
+        sysLogger.debug(f"扫描分享的文件夹完成, 文件个数: {self._file_count}, 路径: {targetPath}")
+        self.signal.emit((self.fileObj, ShareCreationStatus.SUCCESS, self._file_count))
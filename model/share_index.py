@@ -0,0 +1,223 @@
+__all__ = [
+    "dump_share_index",
+    "load_share_index",
+    "remove_share_index",
+    "remove_share_indexes",
+]
+
+import os
+import mmap
+import struct
+import tempfile
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+from model.file import DirModel
+from settings import settings
+from utils.logger import sysLogger
+
+# 索引文件格式(小端):
+#   文件头: 魔数, 版本号, 文件夹记录个数, 分享根路径长度, 分享根路径
+#   文件夹记录: 相对路径长度, 扫描时的修改时间(纳秒), 下级个数, 相对路径(以"/"分隔)
+#   下级记录: 是否为文件夹, 文件名长度, 文件大小, 文件修改时间(纳秒), 文件名, 文件夹及大小未知的文件大小为-1
+# 文件夹记录按层序写入, 父级总在子级之前, 恢复时只需顺序读取一遍
+_MAGIC = b"FSIX"
+_VERSION = 2
+_header_struct = struct.Struct("<4sHII")
+_dir_struct = struct.Struct("<IqI")
+_entry_struct = struct.Struct("<?Hqq")
+_INDEX_DIR_NAME = "share_indexes"
+
+
+def _encode(name: str) -> bytes:
+    return name.encode("utf-8", "surrogateescape")
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", "surrogateescape")
+
+
+def _generate_index_path(uuid: str) -> str:
+    return os.path.join(settings.BASE_DIR, _INDEX_DIR_NAME, f"{uuid}.idx")
+
+
+def dump_share_index(dirObj: DirModel) -> None:
+    """
+    将分享文件夹已扫描的文件树写入索引文件, 与file_sharing_backups.json位于同一目录下
+
+    Args:
+        dirObj: 分享的根文件夹对象
+
+    Returns:
+        None
+    """
+    records: List[bytes] = []
+    level_dirs = deque([("", dirObj)])
+    while level_dirs:
+        relative_path, obj = level_dirs.popleft()
+        if not obj.isScanned:
+            continue
+        children = obj.children
+        data = bytearray()
+        for child in children.values():
+            name = _encode(child.file_name)
+            size = -1 if child.size is None else child.size
+            data += _entry_struct.pack(child.isDir, len(name), size, child.mtime_ns)
+            data += name
+            if child.isDir:
+                level_dirs.append((f"{relative_path}/{child.file_name}", child))
+        path = _encode(relative_path)
+        records.append(
+            _dir_struct.pack(len(path), obj.mtime_ns, len(children)) + path + data
+        )
+
+    root_path = _encode(dirObj.targetPath)
+    header = _header_struct.pack(_MAGIC, _VERSION, len(records), len(root_path))
+    index_path = _generate_index_path(dirObj.uuid)
+    index_dir = os.path.dirname(index_path)
+    os.makedirs(index_dir, exist_ok=True)
+    # 先写入临时文件再替换, 进程在写入时被结束也不会留下损坏的索引,
+    # 界面进程与HTTP服务进程可能同时写入同一分享的索引, 各自使用唯一的临时文件
+    fd, temp_path = tempfile.mkstemp(".tmp", f"{dirObj.uuid}.", index_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header + root_path)
+            for record in records:
+                f.write(record)
+        os.replace(temp_path, index_path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_entries(
+    buffer: mmap.mmap, offset: int, count: int
+) -> Tuple[int, List[Tuple[str, bool, int, int]]]:
+    entries = []
+    for _ in range(count):
+        is_dir, length, size, mtime_ns = _entry_struct.unpack_from(buffer, offset)
+        offset += _entry_struct.size
+        name = _decode(buffer[offset : offset + length])
+        entries.append((name, is_dir, size, mtime_ns))
+        offset += length
+
+    return offset, entries
+
+
+def _skip_entries(buffer: mmap.mmap, offset: int, count: int) -> int:
+    for _ in range(count):
+        length = _entry_struct.unpack_from(buffer, offset)[1]
+        offset += _entry_struct.size + length
+
+    return offset
+
+
+def load_share_index(dirObj: DirModel) -> int:
+    """
+    由索引文件恢复分享文件夹的文件树, 只比对各文件夹的修改时间, 未变化的文件夹直接恢复下级,
+    发生变化的文件夹及其下级保持未扫描, 在访问时再扫描
+
+    Args:
+        dirObj: 分享的根文件夹对象
+
+    Returns:
+        int: 恢复的文件夹个数
+    """
+    index_path = _generate_index_path(dirObj.uuid)
+    try:
+        with open(index_path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return 0
+
+    try:
+        return _restore_tree(dirObj, buffer)
+    except (struct.error, ValueError, IndexError):
+        sysLogger.warning(f"分享索引文件已损坏, 将重新扫描分享文件夹, 索引文件路径: {index_path}")
+        return 0
+    finally:
+        buffer.close()
+
+
+def _restore_tree(dirObj: DirModel, buffer: mmap.mmap) -> int:
+    magic, version, dir_count, length = _header_struct.unpack_from(buffer, 0)
+    offset = _header_struct.size
+    root_path = _decode(buffer[offset : offset + length])
+    offset += length
+    if magic != _MAGIC or version != _VERSION or root_path != dirObj.targetPath:
+        return 0
+
+    restored = 0
+    dirs: Dict[str, DirModel] = {"": dirObj}
+    for _ in range(dir_count):
+        length, mtime_ns, count = _dir_struct.unpack_from(buffer, offset)
+        offset += _dir_struct.size
+        relative_path = _decode(buffer[offset : offset + length])
+        offset += length
+
+        obj = dirs.pop(relative_path, None)
+        if obj is None or obj.isScanned or not _is_unchanged(obj, mtime_ns):
+            offset = _skip_entries(buffer, offset, count)
+            continue
+
+        offset, entries = _read_entries(buffer, offset, count)
+        obj.load_children(mtime_ns, entries)
+        restored += 1
+        for child in obj.children.values():
+            if child.isDir:
+                dirs[f"{relative_path}/{child.file_name}"] = child
+
+    return restored
+
+
+def _is_unchanged(dirObj: DirModel, mtime_ns: int) -> bool:
+    if mtime_ns < 0:
+        return False
+    try:
+        return os.stat(dirObj.targetPath).st_mtime_ns == mtime_ns
+    except OSError:
+        return False
+
+
+def remove_share_index(uuid: str) -> None:
+    """
+    删除单个分享的索引文件, 索引文件不存在时忽略
+
+    Args:
+        uuid: 分享的uuid
+
+    Returns:
+        None
+    """
+    try:
+        os.remove(_generate_index_path(uuid))
+    except OSError:
+        pass
+
+
+def remove_share_indexes(keep_uuids: Iterable[str]) -> None:
+    """
+    删除已不在分享记录中的分享的索引文件
+
+    Args:
+        keep_uuids: 需保留索引文件的分享uuid
+
+    Returns:
+        None
+    """
+    index_dir = os.path.join(settings.BASE_DIR, _INDEX_DIR_NAME)
+    keep_names = {f"{uuid}.idx" for uuid in keep_uuids}
+    try:
+        names = os.listdir(index_dir)
+    except OSError:
+        return
+    for name in names:
+        if name in keep_names:
+            continue
+        try:
+            os.remove(os.path.join(index_dir, name))
+        except OSError:
+            continue
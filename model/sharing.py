@@ -5,6 +5,7 @@ import json
 from typing import Union, Optional
 
 from .file import FileModel, DirModel
+from .share_index import remove_share_indexes
 from .public_types import ShareType as shareType
 from settings import settings
 from utils.logger import sysLogger
@@ -139,6 +140,7 @@ class FuseSharingModel(list):
                 backup_result, f, indent=4, separators=(",", ": "), ensure_ascii=False
             )
 
+        remove_share_indexes(fileObj.uuid for fileObj in self)
         sysLogger.debug("写入历史分享记录成功")
 
     @classmethod
@@ -180,10 +182,8 @@ class FuseSharingModel(list):
             if path_share_param in path_share_params:
                 continue
             path_share_params.append(path_share_param)
-            isDir = file_dict.get("isDir")
-            fileModel = FileModel if not isDir else DirModel
             try:
-                fileObj = fileModel(**file_dict)
+                fileObj = FileModel.load_dump_backup(file_dict)
             except TypeError:
                 sysLogger.error("加载历史分享记录失败, file_sharing_backups.json文件已损坏")
                 return model
@@ -1,5 +1,6 @@
 import os
 import sys
+from typing import Optional, Tuple
 
 from utils.public_func import (
     get_system,
@@ -7,7 +8,7 @@ from utils.public_func import (
     generate_project_path,
     generate_product_version,
 )
-from model.public_types import ThemeColor, ColorCardStruct
+from model.public_types import ThemeColor, ColorCardStruct, FtpServerMode
 
 """
 请移步 `development.py` 或 `production.py` 修改配置, 配置名称字母均大写才有效
@@ -33,6 +34,29 @@ LOCAL_HOST: str = get_local_ip()
 # 后端端口
 # WSGI_PORT: int = 8080
 
+# FTP服务的端口, 所有FTP分享共用一个FTP服务, 各分享以各自的用户名登录, 被占用时开启FTP服务前顺延选择有效端口
+FTP_PORT: int = 2121
+
+# FTP服务的并发模式, 默认单线程异步, 多线程/多进程模式下多个客户端同时下载可利用多个CPU核心, 多进程模式仅支持POSIX系统
+FTP_SERVER_MODE: FtpServerMode = FtpServerMode.single
+
+# FTP下载是否使用零拷贝(sendfile)发送文件, 仅二进制模式传输时生效
+FTP_USE_SENDFILE: bool = True
+
+# FTP数据连接的接收/发送缓冲区大小(字节), 千兆局域网下较大的缓冲区可减少系统调用次数
+FTP_IN_BUFFER_SIZE: int = 262144
+FTP_OUT_BUFFER_SIZE: int = 262144
+
+# FTP服务的最大连接数和单个IP的最大连接数, 为0时不限制
+FTP_MAX_CONS: int = 512
+FTP_MAX_CONS_PER_IP: int = 0
+
+# FTP被动模式的端口范围(起始端口, 结束端口), 为None时由系统随机分配, 需配置防火墙时可指定范围
+FTP_PASSIVE_PORTS: Optional[Tuple[int, int]] = None
+
+# 下载FTP分享文件夹时与对方FTP服务建立的并行连接数
+FTP_DOWNLOAD_CONNECTIONS: int = 4
+
 # 是否Debug
 DEBUG: bool = False
 
@@ -48,6 +72,45 @@ LOGS_PATH: str = os.path.join(BASE_DIR, "logs")
 # 下载目录路径
 DOWNLOAD_DIR: str = os.path.join(BASE_DIR, "Download")
 
+# 同时下载的HTTP分享文件个数, 任一文件下载结束即开始下载下一个
+HTTP_DOWNLOAD_CONCURRENCY: int = 5
+
+# 下载HTTP分享的文件夹时是否由对方打包成一个TAR流下载, 文件数量多时更快,
+# 但暂停或中断后需重新下载整个压缩包, 且不会跳过本地已完整的文件, 默认逐个文件下载
+HTTP_ARCHIVE_DOWNLOAD: bool = False
+
+# 分段并行下载单个HTTP分享文件时的分段数, 为1时不分段
+HTTP_DOWNLOAD_SEGMENTS: int = 4
+
+# 不小于该大小(字节)的HTTP分享文件才分段下载, 对方不支持按区间返回时退回单连接下载
+HTTP_SEGMENT_MIN_SIZE: int = 67108864
+
+# HTTP客户端与同一主机保持的最大连接数, 浏览、获取FTP参数和下载均复用已建立的连接,
+# 下载时不少于 HTTP_DOWNLOAD_CONCURRENCY * HTTP_DOWNLOAD_SEGMENTS, 保证各文件的分段可同时下载
+HTTP_CLIENT_CONNECTIONS_PER_HOST: int = 20
+
+# HTTP客户端空闲连接的保持时间(秒), 需小于对方HTTP服务的keep-alive超时(uvicorn默认为5秒)
+HTTP_CLIENT_KEEPALIVE_TIMEOUT: float = 4
+
+# HTTP下载是否使用零拷贝(sendfile)发送文件, 不支持时自动退回到分块读取发送
+ZERO_COPY_DOWNLOAD: bool = True
+
+# 浏览文件列表时每页返回的子级文件/文件夹个数
+FILE_LIST_PAGE_SIZE: int = 1000
+
+# 扫描文件夹的线程数, 分享位于网络文件系统时, 扫描耗时主要取决于此
+INDEX_WORKERS: int = 8
+
+# 轮询检测分享文件夹变化的间隔(秒), 仅用于不支持inotify的系统或inotify监听数量超出上限时,
+# 每次轮询需比对已扫描文件夹内各文件的大小和修改时间, 分享的文件很多时可适当调大
+FS_POLL_INTERVAL: int = 3
+
+# 分享文件树写入索引文件的间隔(秒), 重启后由索引文件恢复未变化的文件夹, 无需重新扫描
+SHARE_INDEX_SAVE_INTERVAL: int = 30
+
+# 分享文件夹内文件个数超过该值时提示建议打包后再分享, 仍可选择直接分享
+SHARE_FILE_COUNT_WARNING: int = 10000
+
 # 主题颜色
 THEME_COLOR: ThemeColor = ThemeColor.Default
 
@@ -0,0 +1,59 @@
+__all__ = ["get_http_session", "create_async_http_session"]
+
+from threading import Lock
+from typing import Union
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from settings import settings
+
+_session: Union[None, requests.Session] = None
+_session_lock = Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    获取进程内共享的HTTP会话, 浏览分享链接、获取FTP参数等同步请求共用, 按主机复用已建立的连接,
+    无需每次请求都重新握手
+
+    Returns:
+        requests.Session: 共享的HTTP会话
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # 空闲连接可能已被对方关闭, 复用失败时重试一次
+            adapter = HTTPAdapter(
+                pool_maxsize=settings.HTTP_CLIENT_CONNECTIONS_PER_HOST, max_retries=1
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+
+    return _session
+
+
+def create_async_http_session() -> aiohttp.ClientSession:
+    """
+    创建下载用的异步HTTP会话, 连接按主机限制个数并保持复用, aiohttp的会话与事件循环绑定,
+    需在下载线程的事件循环内创建, 并在线程运行期间一直使用
+
+    Returns:
+        aiohttp.ClientSession: 异步HTTP会话
+    """
+    # 同时下载的每个文件都可能分段占用多个连接, 连接数不足时各分段会在连接池中排队
+    limit_per_host = max(
+        settings.HTTP_CLIENT_CONNECTIONS_PER_HOST,
+        settings.HTTP_DOWNLOAD_CONCURRENCY * settings.HTTP_DOWNLOAD_SEGMENTS,
+    )
+    connector = aiohttp.TCPConnector(
+        limit=0,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=settings.HTTP_CLIENT_KEEPALIVE_TIMEOUT,
+    )
+    timeout = aiohttp.ClientTimeout(total=600)
+
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
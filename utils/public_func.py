@@ -1,14 +1,17 @@
 __all__ = [
     "get_system",
     "generate_uuid",
+    "generate_child_uuid",
     "generate_timestamp",
     "get_local_ip",
     "generate_ftp_passwd",
     "exists_port",
     "generate_http_port",
+    "generate_ftp_port",
     "generate_project_path",
     "get_config_from_toml",
     "generate_product_version",
+    "scan_dir",
 ]
 
 import time
@@ -19,7 +22,8 @@ import sys
 import platform
 import uuid
 import json
-from typing import Dict, Any, Callable
+import hashlib
+from typing import Dict, Any, Callable, List
 
 import toml
 from PyQt5.Qt import QApplication
@@ -46,6 +50,25 @@ def generate_uuid() -> str:
     return str(uuid.uuid1()).replace("-", "")
 
 
+def generate_child_uuid(parent_uuid: str, file_name: str) -> str:
+    """
+    由父级的uuid和文件名生成下级文件/文件夹的uuid, 逐级推导下去即为分享的uuid加相对路径的哈希,
+    同一分享下同一路径的uuid始终相同, 服务重启或重新扫描后下载链接依然有效
+
+    Args:
+        parent_uuid: 父级文件夹的uuid
+        file_name: 文件/文件夹名
+
+    Returns:
+        str: 下级文件/文件夹的uuid, 首字母与父级相同(分享类型)
+    """
+    digest = hashlib.blake2b(
+        f"{parent_uuid}/{file_name}".encode("utf-8", "surrogateescape"),
+        digest_size=16,
+    ).hexdigest()
+    return f"{parent_uuid[0]}{digest}"
+
+
 def generate_timestamp() -> int:
     """
     获取毫秒
@@ -130,6 +153,22 @@ def generate_http_port(start_port: int) -> int:
         return start_port
 
 
+def generate_ftp_port(start_port: int) -> int:
+    """
+    生成FTP可用端口, 起始端口被占用时依次顺延
+
+    Args:
+        start_port: 起始端口
+
+    Returns:
+        int: FTP可用端口
+    """
+    while exists_port(start_port):
+        start_port += 1
+
+    return start_port
+
+
 def generate_project_path() -> str:
     """
     生成项目主目录路径
@@ -249,3 +288,68 @@ def update_downloadUrl_with_hitLog(fileDict: Dict[str, Any]) -> None:
     if ptype.HIT_LOG not in fileDict["downloadUrl"]:
         new_download_url = f"{fileDict['downloadUrl']}?{ptype.HIT_LOG}=true"
         fileDict.update({"downloadUrl": new_download_url})
+
+
+def remove_hitLog_from_downloadUrl(download_url: str) -> str:
+    """
+    去掉download_url中的HIT_LOG标志, 同一文件的其余请求不再让服务端重复写下载记录
+
+    Args:
+        download_url: 文件的下载链接
+
+    Returns:
+        str: 不含HIT_LOG标志的下载链接
+    """
+    url, _, query = download_url.partition("?")
+    params = [x for x in query.split("&") if x and x.split("=", 1)[0] != ptype.HIT_LOG]
+    return f"{url}?{'&'.join(params)}" if params else url
+
+
+def generate_browseUrl_from_downloadUrl(fileDict: Dict[str, Any]) -> str:
+    """
+    由download_url生成文件/文件夹的文件列表链接, 用于按需加载文件夹的子级
+
+    Args:
+        fileDict: 文件/文件夹对象
+
+    Returns:
+        str: 文件列表链接
+    """
+    download_url = fileDict["downloadUrl"].split("?", 1)[0]
+    prefix, uuid = download_url.rsplit(f"{ptype.DOWNLOAD_URI}/", 1)
+    return f"{prefix}{ptype.FILE_LIST_URI}/{uuid}"
+
+
+def update_downloadUrl_with_archive(
+    fileDict: Dict[str, Any], archive_type: ptype.ArchiveType
+) -> None:
+    """
+    更新download_url, 以便服务端将文件夹打包成一个压缩包流式返回
+
+    Args:
+        fileDict: 需下载的文件夹对象
+        archive_type: 压缩包格式
+
+    Returns:
+        None
+    """
+    if ptype.ARCHIVE not in fileDict["downloadUrl"]:
+        separator = "&" if "?" in fileDict["downloadUrl"] else "?"
+        new_download_url = (
+            f"{fileDict['downloadUrl']}{separator}{ptype.ARCHIVE}={archive_type.value}"
+        )
+        fileDict.update({"downloadUrl": new_download_url})
+
+
+def scan_dir(path: str) -> List[os.DirEntry]:
+    """
+    扫描文件夹的直接下级, DirEntry自带文件类型(Windows下还自带大小和修改时间), 无需再逐个stat
+
+    Args:
+        path: 文件夹路径
+
+    Returns:
+        List[os.DirEntry]: 下级文件/文件夹的DirEntry
+    """
+    with os.scandir(path) as it:
+        return list(it)
@@ -0,0 +1,143 @@
+__all__ = ["TarStreamExtractor"]
+
+import os
+import tarfile
+from typing import Dict, Union, BinaryIO
+
+from exceptions import OperationException
+
+
+class TarStreamExtractor:
+    def __init__(self, base_path: str):
+        """
+        TAR流式解包类初始化函数, 边接收数据边解包, 无需先将压缩包完整保存到本地
+
+        Args:
+            base_path: 解包的目标文件夹路径
+        """
+        self._base_path = os.path.abspath(base_path)
+        self._buffer = bytearray()
+        # 当前成员剩余的数据长度及其后的补齐长度
+        self._remaining = 0
+        self._padding = 0
+        self._file: Union[None, BinaryIO] = None
+        self._tarinfo: Union[None, tarfile.TarInfo] = None
+        self._pax_data: Union[None, bytearray] = None
+        self._pax_headers: Dict[str, str] = {}
+        self.finished = False
+
+    def feed(self, data: bytes) -> None:
+        """
+        写入接收到的数据并解包
+
+        Args:
+            data: 接收到的数据
+
+        Returns:
+            None
+        """
+        if self.finished:
+            return
+        self._buffer.extend(data)
+        while not self.finished:
+            if self._remaining:
+                if not self._buffer:
+                    return
+                self._consume_member_data()
+            elif self._padding:
+                if len(self._buffer) < self._padding:
+                    return
+                del self._buffer[: self._padding]
+                self._padding = 0
+                self._finish_member()
+            elif self._tarinfo is not None:
+                self._finish_member()
+            elif len(self._buffer) >= tarfile.BLOCKSIZE:
+                block = bytes(self._buffer[: tarfile.BLOCKSIZE])
+                del self._buffer[: tarfile.BLOCKSIZE]
+                self._process_header(block)
+            else:
+                return
+
+    def close(self) -> None:
+        """
+        结束解包, 关闭未写完的文件
+
+        Returns:
+            None
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _consume_member_data(self) -> None:
+        size = min(self._remaining, len(self._buffer))
+        if self._pax_data is not None:
+            self._pax_data.extend(self._buffer[:size])
+        elif self._file is not None:
+            self._file.write(self._buffer[:size])
+        del self._buffer[:size]
+        self._remaining -= size
+
+    def _process_header(self, block: bytes) -> None:
+        # 全0的块为压缩包的结束标志
+        if block == bytes(tarfile.BLOCKSIZE):
+            self.finished = True
+            return
+
+        tarinfo = tarfile.TarInfo.frombuf(block, "utf-8", "surrogateescape")
+        if tarinfo.type in (tarfile.XHDTYPE, tarfile.XGLTYPE):
+            self._pax_data = bytearray()
+        else:
+            tarinfo.name = self._pax_headers.get("path", tarinfo.name)
+            if "size" in self._pax_headers:
+                tarinfo.size = int(self._pax_headers["size"])
+            self._pax_headers = {}
+            self._open_member(tarinfo)
+
+        self._tarinfo = tarinfo
+        self._remaining = tarinfo.size
+        self._padding = -tarinfo.size % tarfile.BLOCKSIZE
+
+    def _open_member(self, tarinfo: tarfile.TarInfo) -> None:
+        target_path = self._generate_target_path(tarinfo.name)
+        if tarinfo.isdir():
+            os.makedirs(target_path, exist_ok=True)
+        elif tarinfo.isreg():
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            self._file = open(target_path, "wb")
+
+    def _finish_member(self) -> None:
+        tarinfo, self._tarinfo = self._tarinfo, None
+        if self._pax_data is not None:
+            self._pax_headers = self._parse_pax_headers(bytes(self._pax_data))
+            self._pax_data = None
+        elif self._file is not None:
+            self._file.close()
+            self._file = None
+            target_path = self._generate_target_path(tarinfo.name)
+            os.utime(target_path, (tarinfo.mtime, tarinfo.mtime))
+
+    def _generate_target_path(self, name: str) -> str:
+        # 防止压缩包中的路径越出解包的目标文件夹
+        parts = [x for x in name.replace("\\", "/").split("/") if x not in ("", ".")]
+        if not parts or ".." in parts or os.path.splitdrive(parts[0])[0]:
+            raise OperationException(f"压缩包中存在非法路径: {name}")
+
+        return os.path.join(self._base_path, *parts)
+
+    @staticmethod
+    def _parse_pax_headers(data: bytes) -> Dict[str, str]:
+        # PAX扩展头的每条记录格式为: "长度 键=值\n", 长度包含记录本身
+        headers = {}
+        pos = 0
+        while pos < len(data):
+            length, _, _ = data[pos:].partition(b" ")
+            if not length.isdigit():
+                break
+            record = data[pos : pos + int(length)]
+            key, _, value = record.partition(b" ")[2].partition(b"=")
+            headers[key.decode("utf-8")] = value[:-1].decode("utf-8", "surrogateescape")
+            pos += int(length)
+
+        return headers